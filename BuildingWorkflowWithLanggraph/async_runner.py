@@ -0,0 +1,141 @@
+"""Many concurrent graph runs on one event loop
+With synchronous nodes, every in-flight LLM call holds a thread, so the number of
+threads caps how many graph runs we can have going at once. The job-application nodes
+now also have native async implementations (see job_application.py), so `graph.ainvoke`
+just awaits the LLM, and a single event loop can keep tens of thousands of runs in flight.
+
+`run_concurrently` drives a list of inputs through a graph under a concurrency limit
+and reports throughput, latency percentiles and the memory each in-flight run costs.
+"""
+
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RunReport:
+    runs: int
+    failures: int
+    wall_time: float
+    latencies: list[float] = field(repr=False)
+    max_in_flight: int
+    memory_per_run: float = None
+
+    @property
+    def throughput(self) -> float:
+        return self.runs / self.wall_time if self.wall_time else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    @property
+    def mean_latency(self) -> float:
+        return statistics.fmean(self.latencies) if self.latencies else 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"{self.runs} runs ({self.failures} failed) in {self.wall_time:.2f}s: "
+            f"{self.throughput:,.0f} runs/s, max {self.max_in_flight} in flight, "
+            f"latency p50 {self.percentile(50) * 1000:.0f} ms / p99 {self.percentile(99) * 1000:.0f} ms "
+            f"/ mean {self.mean_latency * 1000:.0f} ms"
+        )
+        if self.memory_per_run is not None:
+            text += f", ~{self.memory_per_run / 1024:.1f} KiB per in-flight run"
+        return text
+
+
+async def run_concurrently(graph, inputs: list, config: dict = None, concurrency: int = 10_000,
+                           trace_memory: bool = False) -> tuple[list, RunReport]:
+    """Run `graph.ainvoke` for every input, at most `concurrency` at a time.
+
+    Results come back in input order; a failed run gives its exception instead of a state.
+    With `trace_memory`, tracemalloc measures the Python heap at the moment the most runs
+    are in flight, which divided by their number gives the memory cost of one run
+    (tracemalloc slows everything down, so throughput numbers from such a run are off).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results = [None] * len(inputs)
+    latencies = []
+    state = {"in_flight": 0, "max_in_flight": 0, "peak_memory": 0, "failures": 0}
+
+    async def run(i, item):
+        async with semaphore:
+            state["in_flight"] += 1
+            if state["in_flight"] > state["max_in_flight"]:
+                state["max_in_flight"] = state["in_flight"]
+            start = time.perf_counter()
+            try:
+                results[i] = await graph.ainvoke(item, config=config)
+            except Exception as e:
+                results[i] = e
+                state["failures"] += 1
+            finally:
+                latencies.append(time.perf_counter() - start)
+                state["in_flight"] -= 1
+
+    async def sample_memory():
+        while True:
+            await asyncio.sleep(0.05)
+            state["peak_memory"] = max(state["peak_memory"], tracemalloc.get_traced_memory()[0] - baseline)
+
+    baseline = 0
+    sampler = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        sampler = asyncio.create_task(sample_memory())
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run(i, item) for i, item in enumerate(inputs)))
+    finally:
+        wall_time = time.perf_counter() - start
+        if sampler is not None:
+            sampler.cancel()
+            tracemalloc.stop()
+
+    report = RunReport(
+        runs=len(inputs),
+        failures=state["failures"],
+        wall_time=wall_time,
+        latencies=latencies,
+        max_in_flight=state["max_in_flight"],
+        memory_per_run=state["peak_memory"] / state["max_in_flight"] if trace_memory and state["max_in_flight"] else None,
+    )
+    return results, report
+
+
+"""
+Let's simulate an upstream endpoint that takes 500 ms per call and see how many
+job-application runs a single event loop can keep going.
+"""
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+    from job_application import llm_factories, registry
+
+    async def endpoint_with_latency(prompt):
+        await asyncio.sleep(0.5)
+        return AIMessage(content="YES")
+
+    llm_factories["latency_fake"] = lambda: RunnableLambda(lambda x: None, afunc=endpoint_with_latency)
+    graph = registry.get("job_application")
+    config = {"configurable": {"model_provider": "latency_fake"}}
+
+    inputs = [{"job_description": f"job description {i}"} for i in range(500)]
+    _, report = asyncio.run(run_concurrently(graph, inputs, config, concurrency=500, trace_memory=True))
+    print("memory:", report.summary())
+
+    # Past a few hundred runs per second the loop itself (LangGraph's per-step work) becomes
+    # the bottleneck, so watch p99 latency when raising the concurrency further.
+    inputs = [{"job_description": f"job description {i}"} for i in range(10_000)]
+    _, report = asyncio.run(run_concurrently(graph, inputs, config, concurrency=1_000))
+    print("throughput:", report.summary())
@@ -0,0 +1,277 @@
+"""Content-addressed storage for large state fields
+`job_description` (and later the generated `application`) can be many kilobytes. Being
+plain state fields, they are copied into every state snapshot, stream chunk and
+checkpoint, so checkpoint size and serialization time grow with the JD for no reason.
+
+Instead we store each large value once, under its SHA-256, and keep only a short
+reference string like "blob:sha256:ab12..." in the state. Nodes wrapped with
+`with_blobs` see a state that resolves references only for the keys they actually
+read. The disk store memory-maps blobs, so `get_bytes` hands out a view of the file
+without reading or copying it; `get_text`, which nodes see through `LazyState`, decodes
+that view into a new `str`, which is one copy. Sync and async nodes (and runnables) can
+be wrapped alike.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Iterator, Union
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig
+
+from node_wrapping import NodeWrapper, as_runnable
+
+BLOB_PREFIX = "blob:sha256:"
+
+
+def is_blob_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """Base class: subclasses store and load raw bytes by digest."""
+
+    def __init__(self, text_cache_size: int = 128):
+        self._texts: OrderedDict[str, str] = OrderedDict()
+        self._text_cache_size = text_cache_size
+        self._lock = threading.Lock()
+
+    def _put(self, digest: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def _get(self, digest: str) -> Union[bytes, memoryview]:
+        raise NotImplementedError
+
+    def put(self, value: Union[str, bytes]) -> str:
+        data = value.encode("utf-8") if isinstance(value, str) else value
+        digest = _digest(data)
+        self._put(digest, data)
+        return BLOB_PREFIX + digest
+
+    def get_bytes(self, ref: str) -> Union[bytes, memoryview]:
+        """Raw content; a memoryview over the mapped file for the disk store."""
+        if not is_blob_ref(ref):
+            raise ValueError(f"Not a blob reference: {ref!r}")
+        return self._get(ref[len(BLOB_PREFIX):])
+
+    def get_text(self, ref: str) -> str:
+        """Content decoded as UTF-8: a copy, unlike `get_bytes`; recent results are cached."""
+        with self._lock:
+            text = self._texts.get(ref)
+            if text is not None:
+                self._texts.move_to_end(ref)
+                return text
+        text = str(self.get_bytes(ref), "utf-8")
+        with self._lock:
+            self._texts[ref] = text
+            if len(self._texts) > self._text_cache_size:
+                self._texts.popitem(last=False)
+        return text
+
+
+class MemoryBlobStore(BlobStore):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._blobs: dict[str, bytes] = {}
+
+    def _put(self, digest: str, data: bytes) -> None:
+        self._blobs.setdefault(digest, bytes(data))
+
+    def _get(self, digest: str) -> memoryview:
+        return memoryview(self._blobs[digest])
+
+
+class DiskBlobStore(BlobStore):
+    """Blobs as files under `root/ab/abcdef...`, written once and memory-mapped on read.
+
+    At most `max_open_maps` files stay mapped, least recently read first out. A map is
+    closed when it leaves, or on `close()`; one a caller still holds a view of is closed
+    by the garbage collector once the last view goes away.
+    """
+
+    def __init__(self, root: str, max_open_maps: int = 64, **kwargs):
+        super().__init__(**kwargs)
+        self.root = root
+        self.max_open_maps = max_open_maps
+        self._maps: OrderedDict[str, mmap.mmap] = OrderedDict()
+        self._maps_lock = threading.Lock()
+
+    @staticmethod
+    def _unmap(mapped: mmap.mmap) -> None:
+        try:
+            mapped.close()
+        except BufferError:
+            # Views of it are still out there.
+            pass
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _put(self, digest: str, data: bytes) -> None:
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _get(self, digest: str) -> memoryview:
+        with self._maps_lock:
+            mapped = self._maps.get(digest)
+            if mapped is not None:
+                self._maps.move_to_end(digest)
+                return memoryview(mapped)
+            path = self._path(digest)
+            if os.path.getsize(path) == 0:
+                return memoryview(b"")
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[digest] = mapped
+            view = memoryview(mapped)
+            while len(self._maps) > self.max_open_maps:
+                self._unmap(self._maps.popitem(last=False)[1])
+            return view
+
+    def close(self) -> None:
+        with self._maps_lock:
+            for mapped in self._maps.values():
+                self._unmap(mapped)
+            self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def offload(update: dict, store: BlobStore, keys: tuple = ("job_description", "application"),
+            min_size: int = 1024) -> dict:
+    """Replace large string values under `keys` with blob references."""
+    if not update:
+        return update
+    return {
+        key: store.put(value) if key in keys and isinstance(value, str) and not is_blob_ref(value)
+        and len(value) >= min_size else value
+        for key, value in update.items()
+    }
+
+
+class LazyState(Mapping):
+    """Read-only view of a graph state that resolves blob references on access."""
+
+    def __init__(self, state: Mapping, store: BlobStore):
+        self._state = state
+        self._store = store
+
+    def __getitem__(self, key):
+        value = self._state[key]
+        return self._store.get_text(value) if is_blob_ref(value) else value
+
+    def __iter__(self) -> Iterator:
+        return iter(self._state)
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+
+class WithBlobs(NodeWrapper):
+    """Runs `runnable` on a `LazyState` and offloads the large values of its update."""
+
+    def __init__(self, runnable: Runnable, store: BlobStore, keys: tuple, min_size: int, name: str = None):
+        super().__init__(runnable, name)
+        self.store = store
+        self.keys = keys
+        self.min_size = min_size
+
+    def invoke(self, input, config: RunnableConfig = None, **kwargs):
+        update = self.runnable.invoke(LazyState(input, self.store), config, **kwargs)
+        return offload(update, self.store, self.keys, self.min_size)
+
+    async def ainvoke(self, input, config: RunnableConfig = None, **kwargs):
+        update = await self.runnable.ainvoke(LazyState(input, self.store), config, **kwargs)
+        return offload(update, self.store, self.keys, self.min_size)
+
+
+def with_blobs(node: Callable, store: BlobStore, keys: tuple = ("job_description", "application"),
+               min_size: int = 1024, name: str = None) -> Runnable:
+    """Wrap a node so it reads through `LazyState` and its large outputs are offloaded."""
+    return WithBlobs(as_runnable(node), store, keys, min_size, name)
+
+
+def resolve(state: Mapping, store: BlobStore) -> dict:
+    """Turn every reference in a final state back into text, e.g. before returning it to a user."""
+    return {key: store.get_text(value) if is_blob_ref(value) else value for key, value in state.items()}
+
+
+"""
+Let's compare checkpoint sizes and the per-step serialization cost with the JD inline
+and as a reference, using the serializer LangGraph checkpointers use.
+"""
+if __name__ == "__main__":
+    import asyncio
+    import tempfile
+    import time
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    from langgraph.graph import StateGraph, START, END
+    from job_application import IsSuitableJobEnum, JobApplicationState
+
+    def analyze_job_description(state):
+        is_suitable = IsSuitableJobEnum.YES if "Java" in state["job_description"] else IsSuitableJobEnum.NO
+        return {"is_suitable": is_suitable, "actions": ["action1"]}
+
+    def generate_application(state):
+        return {"application": "Dear hiring manager, ... " * 200, "actions": ["action2"]}
+
+    async def agenerate_application(state):
+        await asyncio.sleep(0)
+        return generate_application(state)
+
+    def build(store: BlobStore = None):
+        wrap = (lambda node: with_blobs(node, store)) if store else (lambda node: node)
+        builder = StateGraph(JobApplicationState)
+        builder.add_node("analyze_job_description", wrap(analyze_job_description))
+        builder.add_node("generate_application",
+                         wrap(RunnableLambda(generate_application, afunc=agenerate_application)))
+        builder.add_edge(START, "analyze_job_description")
+        builder.add_edge("analyze_job_description", "generate_application")
+        builder.add_edge("generate_application", END)
+        return builder.compile(checkpointer=MemorySaver())
+
+    serde = JsonPlusSerializer()
+    store = DiskBlobStore(tempfile.mkdtemp(), max_open_maps=8)
+    for jd_length in (1_000, 50_000, 500_000):
+        job_description = ("Java developer with Spring and Kafka experience. " * jd_length)[:jd_length]
+        for label, graph, payload in (
+            ("inline", build(), {"job_description": job_description}),
+            ("blobs", build(store), offload({"job_description": job_description}, store)),
+        ):
+            config = {"configurable": {"thread_id": label}}
+            graph.invoke(payload, config)
+            checkpoints = list(graph.checkpointer.list(config))
+            sizes = [len(serde.dumps_typed(c.checkpoint)[1]) for c in checkpoints]
+            final = graph.get_state(config).values
+            start = time.perf_counter()
+            for _ in range(200):
+                serde.dumps_typed(final)
+            per_step = (time.perf_counter() - start) / 200
+            print(f"JD {jd_length:>7} chars, {label:>6}: {len(checkpoints)} checkpoints, "
+                  f"{sum(sizes):>10,} bytes total, {per_step * 1e6:8.1f} us to serialize the state")
+        assert resolve(final, store)["job_description"] == job_description
+
+    final = asyncio.run(build(store).ainvoke(payload, {"configurable": {"thread_id": "async"}}))
+    print(f"async run: application stored as {final['application'][:24]}...")
+    store.close()
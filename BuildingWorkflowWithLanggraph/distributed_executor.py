@@ -0,0 +1,255 @@
+"""Running graph batches across processes and machines
+Every graph here runs in one Python process, so a batch of screenings is limited to one
+core for its CPU-bound parts, and to one box.
+
+`DistributedExecutor` runs a batch of graph inputs on a backend: `MultiprocessingBackend`
+(a local process pool, always available) or `RayBackend` (needs `pip install ray`, see
+requirements.txt; `RayBackend(local_mode=True)` runs on one machine for testing).
+Compiled graphs hold locks and closures and don't pickle, so what travels is a
+`GraphSpec`: the module that registers the graph, its registry name and build options.
+Each worker imports the module and takes the compiled graph from its own registry, once.
+Only the `configurable` part of the config is sent along.
+
+Inputs with the same `locality_key` (e.g. the same job description or tenant) are
+packed into the same chunk, so they run back to back in one worker call and reuse the
+caches the first one warmed; only a group larger than the chunk size is split. Results
+are yielded as chunks complete, not when the whole batch is done. `remote_node` runs a
+single CPU-heavy node function on the backend instead.
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from langchain_core.runnables import RunnableLambda
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteError(Exception):
+    """An input failed on a worker; carries the worker's error as text."""
+
+
+@dataclass(frozen=True)
+class GraphSpec:
+    module: str
+    name: str
+    options: dict = field(default_factory=dict)
+
+    def load(self):
+        importlib.import_module(self.module)
+        from graph_registry import registry
+        return registry.get(self.name, **self.options)
+
+
+def run_chunk(spec: GraphSpec, items: list[tuple[int, Any]], configurable: dict) -> list[tuple[int, bool, Any]]:
+    """Worker side: run one chunk, returning `(index, ok, output or error text)`."""
+    graph = spec.load()
+    config = {"configurable": configurable}
+    results = []
+    for index, input in items:
+        try:
+            results.append((index, True, graph.invoke(input, config)))
+        except Exception as e:
+            # The exception itself may not pickle; its text always does.
+            results.append((index, False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def chunk_inputs(inputs: list, chunk_size: int, locality_key: Optional[Callable[[Any], Any]] = None
+                 ) -> list[list[tuple[int, Any]]]:
+    """Split `(index, input)` pairs into chunks of at most `chunk_size`.
+
+    With a `locality_key`, whole groups of inputs with the same key are packed into
+    chunks; a group is only split when it is larger than `chunk_size` on its own.
+    """
+    indexed = list(enumerate(inputs))
+    if locality_key is None:
+        return [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+    groups: dict[Any, list] = {}
+    for index, input in indexed:
+        groups.setdefault(locality_key(input), []).append((index, input))
+    chunks, current = [], []
+    for group in groups.values():
+        while len(group) > chunk_size:
+            chunks.append(group[:chunk_size])
+            group = group[chunk_size:]
+        if len(current) + len(group) > chunk_size:
+            chunks.append(current)
+            current = []
+        current.extend(group)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class MultiprocessingBackend:
+
+    def __init__(self, processes: int = None, start_method: str = "spawn"):
+        self.processes = processes or os.cpu_count()
+        self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context(start_method))
+
+    def map_unordered(self, func: Callable, args_list: list[tuple]) -> Iterator:
+        futures = [self._pool.submit(func, *args) for args in args_list]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def call(self, func: Callable, *args):
+        return self._pool.submit(func, *args).result()
+
+    async def acall(self, func: Callable, *args):
+        return await asyncio.wrap_future(self._pool.submit(func, *args))
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+
+class RayBackend:
+
+    def __init__(self, address: str = None, local_mode: bool = False, **init_options):
+        try:
+            import ray
+        except ImportError:
+            raise ImportError("RayBackend needs ray: pip install ray") from None
+        self.ray = ray
+        if not ray.is_initialized():
+            ray.init(address=address, local_mode=local_mode, ignore_reinit_error=True, **init_options)
+        self._remote: dict[Callable, Any] = {}
+
+    def _as_remote(self, func: Callable):
+        if func not in self._remote:
+            self._remote[func] = self.ray.remote(func)
+        return self._remote[func]
+
+    def map_unordered(self, func: Callable, args_list: list[tuple]) -> Iterator:
+        remote = self._as_remote(func)
+        pending = [remote.remote(*args) for args in args_list]
+        while pending:
+            done, pending = self.ray.wait(pending, num_returns=1)
+            yield self.ray.get(done[0])
+
+    def call(self, func: Callable, *args):
+        return self.ray.get(self._as_remote(func).remote(*args))
+
+    async def acall(self, func: Callable, *args):
+        return await self._as_remote(func).remote(*args)
+
+    def shutdown(self):
+        self.ray.shutdown()
+
+
+class DistributedExecutor:
+
+    def __init__(self, backend=None, chunk_size: int = 16, locality_key: Callable[[Any], Any] = None):
+        self.backend = backend or MultiprocessingBackend()
+        self.chunk_size = chunk_size
+        self.locality_key = locality_key
+
+    def stream(self, spec: GraphSpec, inputs: list, config: dict = None) -> Iterator[tuple[int, Any]]:
+        """Yield `(index, output)` as chunks finish; failed inputs give a `RemoteError`."""
+        configurable = (config or {}).get("configurable", {})
+        chunks = chunk_inputs(inputs, self.chunk_size, self.locality_key)
+        logger.info(f"Running {len(inputs)} inputs of {spec.name} in {len(chunks)} chunks")
+        for results in self.backend.map_unordered(run_chunk, [(spec, chunk, configurable) for chunk in chunks]):
+            for index, ok, value in results:
+                yield index, value if ok else RemoteError(value)
+
+    def batch(self, spec: GraphSpec, inputs: list, config: dict = None, return_exceptions: bool = False) -> list:
+        outputs = [None] * len(inputs)
+        for index, output in self.stream(spec, inputs, config):
+            if isinstance(output, RemoteError) and not return_exceptions:
+                raise output
+            outputs[index] = output
+        return outputs
+
+    def shutdown(self):
+        self.backend.shutdown()
+
+
+def remote_node(func: Callable, backend) -> RunnableLambda:
+    """Run a node function on the backend; `func` must be importable at module level."""
+
+    def invoke(state):
+        return backend.call(func, state)
+
+    async def ainvoke(state):
+        return await backend.acall(func, state)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=func.__name__)
+
+
+def fingerprint_description(state: dict) -> dict:
+    """A CPU-bound node: shingle and hash the job description for near-duplicate detection."""
+    import hashlib
+    words = state["job_description"].lower().split()
+    shingles = {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+    signature = [min(int(hashlib.blake2b(f"{seed}:{s}".encode(), digest_size=8).hexdigest(), 16) for s in shingles)
+                 for seed in range(64)]
+    return {"actions": [f"fingerprint:{signature[0]:x}"]}
+
+
+def build_fingerprint_graph():
+    from langgraph.graph import StateGraph, START, END
+    from job_application import JobApplicationState, analyze_job_description
+    builder = StateGraph(JobApplicationState)
+    builder.add_node("fingerprint_description", fingerprint_description)
+    builder.add_node("analyze_job_description", analyze_job_description)
+    builder.add_edge(START, "fingerprint_description")
+    builder.add_edge("fingerprint_description", "analyze_job_description")
+    builder.add_edge("analyze_job_description", END)
+    return builder
+
+
+def _register():
+    from graph_registry import registry
+    registry.register("job_fingerprint", build_fingerprint_graph)
+
+
+_register()
+
+
+"""
+Let's screen a batch of long job descriptions in-process and on a local process pool,
+printing results as they stream in. Ray is used too when it's installed.
+"""
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(0)
+    vocabulary = [f"skill{i}" for i in range(500)]
+    postings = [" ".join(random.choices(vocabulary, k=400)) for _ in range(40)]
+    inputs = [{"job_description": postings[i % 20]} for i in range(80)]
+    config = {"configurable": {"model_provider": "fake"}}
+    spec = GraphSpec("distributed_executor", "job_fingerprint")
+
+    start = time.perf_counter()
+    graph = spec.load()
+    expected = [graph.invoke(x, config) for x in inputs]
+    print(f"in process: {time.perf_counter() - start:.2f}s")
+
+    backends = [("multiprocessing", lambda: MultiprocessingBackend(processes=4))]
+    try:
+        import ray  # noqa: F401
+        backends.append(("ray local mode", lambda: RayBackend(local_mode=True)))
+    except ImportError:
+        print("ray not installed, skipping RayBackend")
+
+    for name, make_backend in backends:
+        executor = DistributedExecutor(make_backend(), chunk_size=10, locality_key=lambda x: x["job_description"])
+        start = time.perf_counter()
+        outputs, first = [None] * len(inputs), None
+        for index, output in executor.stream(spec, inputs, config):
+            first = first or time.perf_counter() - start
+            outputs[index] = output
+        print(f"{name} ({os.cpu_count()} cores): {time.perf_counter() - start:.2f}s, first result after {first:.2f}s, "
+              f"same outputs: {outputs == expected}")
+
+        node = remote_node(fingerprint_description, executor.backend)
+        print("remote node:", node.invoke(inputs[0]))
+        executor.shutdown()
@@ -101,11 +101,15 @@ llms = {
     "OPEN_AI": openai_llm
 }
 
+# Build each `llm | parser` chain once instead of on every node call
+# (see graph_registry.py for doing the same with whole compiled graphs).
+analyze_chains = {name: llm | parser for name, llm in llms.items()}
+
 def analyze_job_description(state, config: RunnableConfig):
     try:
       print("here")
-      llm = config["configurable"].get("model_provider", "OPEN_AI")
-      analyze_chain = llm | parser
+      model_provider = config["configurable"].get("model_provider", "OPEN_AI")
+      analyze_chain = analyze_chains[model_provider]
       prompt = prompt_template_enum.format(job_description=job_description)
       result = analyze_chain.invoke(prompt)
       return {"is_suitable": result}
@@ -147,8 +151,7 @@ from langgraph.pregel import RetryPolicy
 
 def analyze_job_description(state, config: RunnableConfig):
     model_provider = config["configurable"].get("model_provider", "Google")
-    llm = llms[model_provider]
-    analyze_chain = llm | parser
+    analyze_chain = analyze_chains[model_provider]
     prompt = prompt_template_enum.format(job_description=job_description)
     result = analyze_chain.invoke(prompt)
     return {"is_suitable": result}
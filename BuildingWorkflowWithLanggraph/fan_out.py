@@ -0,0 +1,187 @@
+"""Map-reduce over many applications
+The job-application graph produces one application per run. To get several variants of
+an application, or to screen many job descriptions at once, we'd have to run the whole
+graph again and again.
+
+Instead, we can let the graph fan out: a conditional edge returns one `Send` per
+(job description, variant) pair, LangGraph runs those branches in parallel, and their
+results are merged into the state by a reducer. `max_concurrency` in the config caps
+how many branches run at the same time, and a time budget cancels whatever is still
+running when it expires. The branch node runs under `graph.invoke` too; there a branch
+can't be interrupted, so the budget only keeps branches that haven't started yet from
+starting.
+"""
+
+import asyncio
+import time
+from typing import Annotated, Optional
+
+from typing_extensions import TypedDict
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+
+from graph_registry import registry
+from job_application import IsSuitableJobEnum, get_analyze_chain, get_llm, prompt_template_enum
+
+application_prompt = (
+    "Write a short job application in a {variant} tone for the job below."
+    "\nJOB DESCRIPTION:\n{job_description}\n"
+)
+
+
+def merge_applications(left: list[dict], right: Optional[list[dict]]) -> list[dict]:
+    # Branches finish in any order; keep the merged list ordered by (job, variant).
+    if not right:
+        return left
+    return sorted(left + right, key=lambda a: (a["index"], a["variant"]))
+
+
+class ApplicationTarget(TypedDict):
+    index: int
+    job_description: str
+    variant: str
+
+
+class FanOutState(TypedDict):
+    job_descriptions: list[str]
+    variants: list[str]
+    applications: Annotated[list[dict], merge_applications]
+
+
+def fan_out(state: FanOutState) -> list[Send]:
+    variants = state.get("variants") or ["neutral"]
+    return [
+        Send("generate_variant", {"index": i, "job_description": job_description, "variant": variant})
+        for i, job_description in enumerate(state["job_descriptions"])
+        for variant in variants
+    ]
+
+
+def _analyze_and_generate(target: ApplicationTarget, model_provider: str):
+    prompt = prompt_template_enum.format(job_description=target["job_description"])
+    is_suitable = get_analyze_chain(model_provider).invoke(prompt)
+    if is_suitable != IsSuitableJobEnum.YES:
+        return "not_suitable", None
+    message = get_llm(model_provider).invoke(application_prompt.format(**target))
+    return "done", message.content
+
+
+async def _aanalyze_and_generate(target: ApplicationTarget, model_provider: str):
+    prompt = prompt_template_enum.format(job_description=target["job_description"])
+    is_suitable = await get_analyze_chain(model_provider).ainvoke(prompt)
+    if is_suitable != IsSuitableJobEnum.YES:
+        return "not_suitable", None
+    message = await get_llm(model_provider).ainvoke(application_prompt.format(**target))
+    return "done", message.content
+
+
+def _remaining(config: RunnableConfig) -> Optional[float]:
+    deadline = config.get("configurable", {}).get("deadline")
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _branch_result(target: ApplicationTarget, status: str, application: Optional[str] = None) -> dict:
+    return {"applications": [
+        {"index": target["index"], "variant": target["variant"], "status": status, "application": application}]}
+
+
+def generate_variant(target: ApplicationTarget, config: RunnableConfig):
+    remaining = _remaining(config)
+    if remaining is not None and remaining <= 0:
+        return _branch_result(target, "cancelled")
+    model_provider = config.get("configurable", {}).get("model_provider", "OPEN_AI")
+    return _branch_result(target, *_analyze_and_generate(target, model_provider))
+
+
+async def agenerate_variant(target: ApplicationTarget, config: RunnableConfig):
+    remaining = _remaining(config)
+    if remaining is not None and remaining <= 0:
+        # Queued behind the concurrency cap until the budget was gone.
+        return _branch_result(target, "cancelled")
+    model_provider = config.get("configurable", {}).get("model_provider", "OPEN_AI")
+    try:
+        status, application = await asyncio.wait_for(
+            _aanalyze_and_generate(target, model_provider), remaining)
+    except asyncio.TimeoutError:
+        status, application = "cancelled", None
+    return _branch_result(target, status, application)
+
+
+def build_fan_out_graph() -> StateGraph:
+    builder = StateGraph(FanOutState)
+    builder.add_node("generate_variant", RunnableLambda(generate_variant, afunc=agenerate_variant))
+    builder.add_conditional_edges(START, fan_out, ["generate_variant"])
+    builder.add_edge("generate_variant", END)
+    return builder
+
+
+registry.register("job_application_fan_out", build_fan_out_graph)
+
+
+async def generate_applications(
+    job_descriptions: list[str],
+    variants: list[str] = None,
+    max_concurrency: int = 8,
+    time_budget: float = None,
+    model_provider: str = "OPEN_AI",
+) -> list[dict]:
+    """Run one branch per (job description, variant) and return the merged applications.
+
+    Branches still running after `time_budget` seconds are cancelled and reported with
+    status "cancelled", so the caller always gets one entry per target.
+    """
+    graph = registry.get("job_application_fan_out")
+    configurable = {"model_provider": model_provider}
+    if time_budget is not None:
+        configurable["deadline"] = time.monotonic() + time_budget
+    state = await graph.ainvoke(
+        {"job_descriptions": job_descriptions, "variants": variants or ["neutral"], "applications": []},
+        config={"max_concurrency": max_concurrency, "configurable": configurable},
+    )
+    return state["applications"]
+
+
+"""
+Let's try it with a slow fake LLM: 5 job descriptions times 3 variants, at most
+4 branches at a time, and a budget that is too short to finish all of them.
+"""
+if __name__ == "__main__":
+    import random
+    from langchain_core.messages import AIMessage
+    from job_application import llm_factories
+
+    running = {"now": 0, "max": 0}
+
+    async def slow_fake_llm(prompt):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        try:
+            await asyncio.sleep(random.uniform(0.05, 0.3))
+        finally:
+            running["now"] -= 1
+        if "Answer only YES or NO" in str(prompt):
+            return AIMessage(content="YES")
+        return AIMessage(content="Dear hiring manager, ...")
+
+    llm_factories["slow_fake"] = lambda: RunnableLambda(lambda x: None, afunc=slow_fake_llm)
+
+    start = time.perf_counter()
+    applications = asyncio.run(generate_applications(
+        [f"job description {i}" for i in range(5)],
+        variants=["formal", "friendly", "concise"],
+        max_concurrency=4,
+        time_budget=1.0,
+        model_provider="slow_fake",
+    ))
+    print(f"{len(applications)} branches in {time.perf_counter() - start:.2f}s, "
+          f"at most {running['max']} LLM calls in flight")
+    for application in applications:
+        print(application)
+
+    # The same graph runs synchronously too, here with the fake LLM.
+    state = registry.get("job_application_fan_out").invoke(
+        {"job_descriptions": ["job description 0"], "variants": ["formal", "friendly"], "applications": []},
+        config={"configurable": {"model_provider": "fake"}})
+    print("graph.invoke:", [(a["variant"], a["status"]) for a in state["applications"]])
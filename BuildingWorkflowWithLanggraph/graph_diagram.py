@@ -0,0 +1,163 @@
+"""Offline graph diagrams
+`graph.get_graph().draw_mermaid_png()` sends the Mermaid source to a remote rendering
+service on every call, so it is slow and fails on hosts without network access.
+
+Our graphs are small, so we can lay them out ourselves: nodes are put into layers by
+their distance from START, and matplotlib (which we already use to show the diagrams)
+draws them to PNG or SVG. Every rendering is cached by a hash of the graph topology,
+in memory and optionally on disk, so drawing the same graph again is instant.
+"""
+
+import hashlib
+import json
+import os
+from collections import deque
+from io import BytesIO
+
+import matplotlib.pyplot as plt
+from matplotlib.patches import FancyBboxPatch
+
+from langgraph.graph import START, END
+
+_cache: dict[str, bytes] = {}
+
+
+def graph_topology(drawable) -> dict:
+    """Nodes and edges of a `graph.get_graph()` result, in a stable order."""
+    return {
+        "nodes": sorted(drawable.nodes),
+        "edges": sorted(
+            [e.source, e.target, bool(e.conditional), "" if e.data is None else str(e.data)]
+            for e in drawable.edges
+        ),
+    }
+
+
+def topology_hash(topology: dict, fmt: str) -> str:
+    payload = json.dumps({"topology": topology, "format": fmt}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def layout(topology: dict) -> dict[str, tuple[float, float]]:
+    """Place nodes in layers by BFS distance from START, END always in the last layer."""
+    successors = {node: [] for node in topology["nodes"]}
+    for source, target, _, _ in topology["edges"]:
+        successors[source].append(target)
+
+    depth = {}
+    queue = deque([START] if START in successors else topology["nodes"][:1])
+    for node in queue:
+        depth[node] = 0
+    while queue:
+        node = queue.popleft()
+        for target in successors[node]:
+            if target not in depth:
+                depth[target] = depth[node] + 1
+                queue.append(target)
+    for node in topology["nodes"]:
+        depth.setdefault(node, 0)
+    others = [depth[n] for n in depth if n != END]
+    if END in depth and others:
+        depth[END] = max(others) + 1
+
+    layers: dict[int, list[str]] = {}
+    for node in topology["nodes"]:
+        layers.setdefault(depth[node], []).append(node)
+    positions = {}
+    for level, nodes in layers.items():
+        for i, node in enumerate(nodes):
+            positions[node] = (i - (len(nodes) - 1) / 2, -level)
+    return positions
+
+
+def _draw(topology: dict, fmt: str) -> bytes:
+    positions = layout(topology)
+    width = max(len(n) for n in topology["nodes"]) * 0.11 + 0.4
+    columns = max(sum(1 for p in positions.values() if p[1] == y) for _, y in positions.values())
+    rows = 1 - min(y for _, y in positions.values())
+    fig, ax = plt.subplots(figsize=(max(3.0, columns * width * 1.3), rows * 1.1))
+
+    def scaled(node):
+        x, y = positions[node]
+        return x * width * 1.3, y
+
+    for source, target, conditional, label in topology["edges"]:
+        (x1, y1), (x2, y2) = scaled(source), scaled(target)
+        # Edges to the next layer are straight; longer or backward ones bend around the nodes.
+        bend = 0.0 if y1 - y2 == 1 else 0.5
+        ax.annotate(
+            "", xy=(x2, y2 + 0.2), xytext=(x1, y1 - 0.2),
+            arrowprops=dict(arrowstyle="->", linestyle="--" if conditional else "-",
+                            connectionstyle=f"arc3,rad={bend}"),
+        )
+        if label:
+            ax.text((x1 + x2) / 2 - bend * (y1 - y2) / 2, (y1 + y2) / 2, label,
+                    fontsize=7, ha="center", va="center")
+
+    for node in topology["nodes"]:
+        x, y = scaled(node)
+        terminal = node in (START, END)
+        node_width = len(node) * 0.11 + 0.2
+        ax.add_patch(FancyBboxPatch(
+            (x - node_width / 2, y - 0.18), node_width, 0.36,
+            boxstyle="round,pad=0.02,rounding_size=0.18" if terminal else "round,pad=0.02",
+            facecolor="#e8e8e8" if terminal else "#f2f0ff", edgecolor="#555555",
+        ))
+        ax.text(x, y, node, ha="center", va="center", fontsize=8)
+
+    ax.set_xlim(-columns * width, columns * width)
+    ax.set_ylim(-rows + 0.5, 0.5)
+    ax.axis("off")
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt, bbox_inches="tight", dpi=120)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def draw_graph(graph, fmt: str = "png", cache_dir: str = None) -> bytes:
+    """Render a compiled graph (or a `get_graph()` result) to PNG or SVG bytes, offline."""
+    drawable = graph.get_graph() if hasattr(graph, "get_graph") else graph
+    topology = graph_topology(drawable)
+    key = topology_hash(topology, fmt)
+    if key in _cache:
+        return _cache[key]
+    path = os.path.join(cache_dir, f"{key}.{fmt}") if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+    else:
+        data = _draw(topology, fmt)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+    _cache[key] = data
+    return data
+
+
+def draw_graph_png(graph, cache_dir: str = None) -> bytes:
+    return draw_graph(graph, "png", cache_dir)
+
+
+def draw_graph_svg(graph, cache_dir: str = None) -> str:
+    return draw_graph(graph, "svg", cache_dir).decode("utf-8")
+
+
+if __name__ == "__main__":
+    import time
+    from job_application import build_job_application_graph
+
+    graph = build_job_application_graph().compile()
+
+    start = time.perf_counter()
+    png_bytes = draw_graph_png(graph)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    draw_graph_png(graph)
+    cached = time.perf_counter() - start
+    print(f"first render {first * 1000:.1f} ms, cached {cached * 1000:.3f} ms, {len(png_bytes)} bytes")
+
+    with open("job_application_graph.svg", "w") as f:
+        f.write(draw_graph_svg(graph))
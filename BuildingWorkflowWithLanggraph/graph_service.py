@@ -0,0 +1,360 @@
+"""Serving graphs and chains over HTTP
+A plain ASGI app (run it with any ASGI server, e.g. `uvicorn graph_service:app`) that
+exposes compiled graphs from the registry and LCEL chains like the ones in LCEL.py:
+
+    POST /graphs/<name>/invoke   {"input": {...}, "config": {"configurable": {...}}}
+    POST /graphs/<name>/stream   same body, answers with server-sent events
+    POST /chains/<name>/invoke
+    POST /chains/<name>/stream
+    GET  /health
+
+Identical requests that are in flight at the same time (same route, same input and
+configurable after whitespace normalization) share one execution: the first one runs
+the graph, the others wait for its result or join its event stream, replaying what was
+already sent. Executions are admitted through a bounded queue; when `max_concurrency`
+runs are going and `max_queue` more are waiting, new work is shed with a 503 and a
+`Retry-After` header instead of piling up. Joining an execution in flight is always
+admitted, since it costs no extra LLM calls.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, Callable, Coroutine, Optional
+
+from delta_streaming import encode_frame
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ExecutionCancelled(Exception):
+    pass
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return WHITESPACE.sub(" ", value).strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def request_key(route: str, input: Any, configurable: dict) -> str:
+    payload = json.dumps([route, _normalize(input), _normalize(configurable)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AdmissionControl:
+    """At most `max_concurrency` executions running and `max_queue` waiting for a slot."""
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.shed = 0
+
+    def admit(self, coro_factory: Callable) -> Coroutine:
+        """Take a place in the queue now, or raise `Overloaded`; the coroutine runs the work."""
+        # Admitted work counts as waiting until its task takes a slot, so compare the total.
+        if self.running + self.waiting >= self.max_concurrency + self.max_queue:
+            self.shed += 1
+            raise Overloaded(f"{self.running} running, {self.waiting} queued")
+        self.waiting += 1
+        return self._run(coro_factory)
+
+    async def _run(self, coro_factory: Callable):
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await coro_factory()
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+
+class SharedStream:
+    """Events of one execution, readable from the start by any number of subscribers."""
+
+    def __init__(self):
+        self.events: list = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def close(self, error: BaseException = None):
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        i = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: i < len(self.events) or self.done)
+                events, done, error = self.events[i:], self.done, self.error
+            for event in events:
+                yield event
+            i += len(events)
+            if done and i == len(self.events):
+                if error is not None:
+                    raise error
+                return
+
+
+class Singleflight:
+    """Coalesces concurrent executions with the same key into one.
+
+    An execution runs on a task owned by the service, not by the request that started it:
+    every caller, the first one included, only waits on it, so a client that goes away
+    cancels its own wait and the others still get the result.
+    """
+
+    def __init__(self, admission: AdmissionControl):
+        self.admission = admission
+        self._calls: dict[str, asyncio.Task] = {}
+        self._streams: dict[str, SharedStream] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.executions = 0
+        self.coalesced = 0
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when nobody was left waiting for it.
+            task.exception()
+
+    async def do(self, key: str, coro_factory: Callable):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._calls[key] = asyncio.get_running_loop().create_task(self.admission.admit(coro_factory))
+            self.executions += 1
+            task.add_done_callback(lambda t: self._finished(key, t))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                raise ExecutionCancelled("The shared execution was cancelled") from None
+            raise
+
+    def stream(self, key: str, iterator_factory: Callable[[], AsyncIterator]) -> AsyncIterator:
+        shared = self._streams.get(key)
+        if shared is not None:
+            self.coalesced += 1
+            return shared.subscribe()
+        shared = SharedStream()
+
+        async def produce():
+            async for event in iterator_factory():
+                await shared.publish(event)
+
+        admitted = self.admission.admit(produce)
+        self.executions += 1
+        self._streams[key] = shared
+
+        async def run():
+            try:
+                await admitted
+                await shared.close()
+            except asyncio.CancelledError:
+                # Subscribers get an error of their own, not a cancellation of their request.
+                await shared.close(ExecutionCancelled("The shared execution was cancelled"))
+                raise
+            except Exception as e:
+                await shared.close(e)
+            finally:
+                del self._streams[key]
+
+        # The execution runs on its own task so it keeps going if the first client disconnects.
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return shared.subscribe()
+
+
+def sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: ".encode("utf-8") + encode_frame(data) + b"\n"
+
+
+class GraphService:
+    """ASGI app over named compiled graphs and LCEL chains."""
+
+    def __init__(self, graphs: dict = None, chains: dict = None, max_concurrency: int = 16, max_queue: int = 64,
+                 timeout: float = 120.0, retry_after: int = 1):
+        self.runnables = {"graphs": graphs or {}, "chains": chains or {}}
+        self.admission = AdmissionControl(max_concurrency, max_queue)
+        self.singleflight = Singleflight(self.admission)
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        if scope["type"] != "http":
+            return
+        parts = scope["path"].strip("/").split("/")
+        if scope["method"] == "GET" and parts == ["health"]:
+            return await self._json(send, 200, self.stats())
+        if scope["method"] != "POST" or len(parts) != 3 or parts[2] not in ("invoke", "stream"):
+            return await self._json(send, 404, {"error": "not found"})
+        kind, name, action = parts
+        runnable = self.runnables.get(kind, {}).get(name)
+        if runnable is None:
+            return await self._json(send, 404, {"error": f"unknown {kind[:-1]} {name!r}"})
+        try:
+            body = json.loads(await self._body(receive) or b"{}")
+            input = body["input"]
+        except (ValueError, KeyError):
+            return await self._json(send, 400, {"error": "body must be JSON with an 'input' field"})
+        # Only configurable values are taken from clients, never callbacks or other config keys.
+        configurable = (body.get("config") or {}).get("configurable", {})
+        config = {"configurable": configurable}
+        key = request_key(scope["path"], input, configurable)
+        try:
+            if action == "invoke":
+                result = await self.singleflight.do(
+                    key, lambda: asyncio.wait_for(runnable.ainvoke(input, config), self.timeout))
+                return await self._json(send, 200, {"output": result})
+            events = self.singleflight.stream(key, lambda: self._events(kind, runnable, input, config))
+            return await self._sse(send, events)
+        except Overloaded as e:
+            logger.warning(f"Shedding {scope['path']}: {e}")
+            return await self._json(send, 503, {"error": "overloaded"},
+                                    [(b"retry-after", str(self.retry_after).encode())])
+        except asyncio.TimeoutError:
+            return await self._json(send, 504, {"error": "timed out"})
+        except Exception as e:
+            logger.exception(f"{scope['path']} failed")
+            return await self._json(send, 500, {"error": str(e)})
+
+    async def _events(self, kind: str, runnable, input, config) -> AsyncIterator[tuple[str, Any]]:
+        if kind == "graphs":
+            async for chunk in runnable.astream(input, config, stream_mode="updates"):
+                for node, update in chunk.items():
+                    yield "update", {"node": node, "update": update}
+        else:
+            async for chunk in runnable.astream(input, config):
+                yield "chunk", chunk
+
+    @staticmethod
+    async def _body(receive) -> bytes:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return body
+
+    @staticmethod
+    async def _json(send, status: int, payload: Any, headers: list = ()):
+        body = encode_frame(payload)
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), *headers]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _sse(self, send, events: AsyncIterator):
+        # Admission is decided before the first byte, so shedding can still answer 503.
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]})
+        try:
+            async for event, data in events:
+                await send({"type": "http.response.body", "body": sse(event, data), "more_body": True})
+            await send({"type": "http.response.body", "body": sse("end", {}), "more_body": False})
+        except Exception as e:
+            logger.exception("Stream failed")
+            await send({"type": "http.response.body", "body": sse("error", {"error": str(e)}), "more_body": False})
+
+    def stats(self) -> dict:
+        return {
+            "executions": self.singleflight.executions,
+            "coalesced": self.singleflight.coalesced,
+            "running": self.admission.running,
+            "queued": self.admission.waiting,
+            "shed": self.admission.shed,
+        }
+
+
+def lcel_chains(llm) -> dict:
+    """The chains from LCEL.py, built on `llm`."""
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    chain = PromptTemplate.from_template("Tell me a joke about {topic}") | llm | StrOutputParser()
+    story_chain = PromptTemplate.from_template("Write a short story about {topic}") | llm | StrOutputParser()
+    analysis_prompt = PromptTemplate.from_template("Analyze the following story's mood:\n{story}")
+    analysis_chain = analysis_prompt | llm | StrOutputParser()
+    return {"joke": chain, "story": story_chain, "story_with_analysis": story_chain | analysis_chain}
+
+
+def create_app(llm=None, **options) -> GraphService:
+    from job_application import registry
+    if llm is None:
+        from job_application import make_openai_llm
+        llm = make_openai_llm()
+    return GraphService(graphs={"job_application": registry.get("job_application")}, chains=lcel_chains(llm),
+                        **options)
+
+
+"""
+Let's send a burst of identical screening requests and a burst of different ones at
+the app, in process through httpx, with a slow fake model behind it.
+"""
+if __name__ == "__main__":
+    import time
+    import httpx
+    from load_test_llm import FixedLatency, LoadTestChatModel
+    from job_application import llm_factories
+
+    llm = LoadTestChatModel(responses=lambda messages: "YES", latency=FixedLatency(0.3))
+    llm_factories["slow"] = lambda: llm
+    app = create_app(llm, max_concurrency=4, max_queue=4)
+    config = {"configurable": {"model_provider": "slow"}}
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://service") as client:
+            start = time.perf_counter()
+            same = [client.post("/graphs/job_application/invoke",
+                                json={"input": {"job_description": "Java  developer "}, "config": config})
+                    for _ in range(50)]
+            responses = await asyncio.gather(*same)
+            print(f"50 identical requests: {time.perf_counter() - start:.2f}s, "
+                  f"statuses {sorted({r.status_code for r in responses})}, {app.stats()}")
+
+            different = [client.post("/graphs/job_application/invoke",
+                                     json={"input": {"job_description": f"Java developer #{i}"}, "config": config})
+                         for i in range(20)]
+            responses = await asyncio.gather(*different)
+            statuses = [r.status_code for r in responses]
+            print(f"20 different requests: {statuses.count(200)} served, {statuses.count(503)} shed, {app.stats()}")
+
+            response = await client.post("/chains/story_with_analysis/stream", json={"input": {"topic": "a rainy day"}})
+            print(response.text)
+
+    asyncio.run(main())
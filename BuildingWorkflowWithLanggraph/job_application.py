@@ -0,0 +1,145 @@
+"""The job-application graph
+The tutorial modules build this graph step by step, each time at import. Here is the
+final version as a reusable piece: the state, the YES/NO classifier chain and the two
+nodes, plus a builder registered in the process-wide graph registry, so other code can
+just ask for `registry.get("job_application")`.
+"""
+
+import inspect
+import itertools
+import logging
+import os
+from enum import Enum
+from operator import add
+from typing import Annotated
+
+from typing_extensions import TypedDict
+from langchain.output_parsers import EnumOutputParser
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import RetryPolicy
+
+from graph_registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+class IsSuitableJobEnum(Enum):
+    YES = "YES"
+    NO = "NO"
+
+
+parser = EnumOutputParser(enum=IsSuitableJobEnum)
+
+prompt_template_enum = (
+    "Given a job description, decide whether it suites a junior Java developer."
+    "\nJOB DESCRIPTION:\n{job_description}\n\nAnswer only YES or NO."
+)
+
+
+class JobApplicationState(TypedDict):
+    job_description: str
+    is_suitable: IsSuitableJobEnum
+    application: str
+    actions: Annotated[list[str], add]
+
+
+def make_fake_llm(answer: str = "YES") -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content=answer)))
+
+
+def make_openai_llm(model: str = "gpt-4.1"):
+    from langchain_openai import ChatOpenAI
+    base_url = os.environ.get("OPEN_AI_LITE_LLM_BASE_URL")
+    api_key = os.environ.get("OPENAI_API_KEY")
+    return ChatOpenAI(model=model, api_key=api_key, base_url=base_url)
+
+
+# Providers are created on first use, so importing this module needs no credentials.
+# A factory that takes an argument is given the `model_name` asked for; one that takes
+# none has a single model, which serves every `model_name`.
+llm_factories = {
+    "fake": lambda: make_fake_llm(),
+    "OPEN_AI": make_openai_llm,
+}
+
+
+def takes_model_name(model_provider: str) -> bool:
+    return bool(inspect.signature(llm_factories[model_provider]).parameters)
+
+
+def get_llm(model_provider: str, model_name: str = None):
+    """The provider's default model, or its `model_name` model; one instance per pair."""
+    factory = llm_factories[model_provider]
+    if model_name is None or not takes_model_name(model_provider):
+        return registry.chain(("llm", model_provider), factory)
+    return registry.chain(("llm", model_provider, model_name), lambda: factory(model_name))
+
+
+def get_analyze_chain(model_provider: str, model_name: str = None):
+    return registry.chain(("analyze_chain", model_provider, model_name),
+                          lambda: get_llm(model_provider, model_name) | parser)
+
+
+def _analyze_chain(config: RunnableConfig):
+    configurable = config.get("configurable", {})
+    return get_analyze_chain(configurable.get("model_provider", "OPEN_AI"), configurable.get("model_name"))
+
+
+def analyze_job_description(state: JobApplicationState, config: RunnableConfig):
+    prompt = prompt_template_enum.format(job_description=state["job_description"])
+    result = _analyze_chain(config).invoke(prompt)
+    return {"is_suitable": result, "actions": ["action1"]}
+
+
+async def aanalyze_job_description(state: JobApplicationState, config: RunnableConfig):
+    prompt = prompt_template_enum.format(job_description=state["job_description"])
+    result = await _analyze_chain(config).ainvoke(prompt)
+    return {"is_suitable": result, "actions": ["action1"]}
+
+
+def generate_application(state: JobApplicationState, config: RunnableConfig):
+    model_provider = config.get("configurable", {}).get("model_provider", "OPEN_AI")
+    model_name = config.get("configurable", {}).get("model_name", "gpt-4.1")
+    logger.info(f"...generating application with {model_provider} and {model_name} ...")
+    return {"application": "some_fake_application", "actions": ["action2"]}
+
+
+async def agenerate_application(state: JobApplicationState, config: RunnableConfig):
+    return generate_application(state, config)
+
+
+def is_suitable_condition(state: JobApplicationState):
+    return state.get("is_suitable") == IsSuitableJobEnum.YES
+
+
+def build_job_application_graph(max_attempts: int = 1) -> StateGraph:
+    builder = StateGraph(JobApplicationState)
+    retry = RetryPolicy(retry_on=ValueError, max_attempts=max_attempts) if max_attempts > 1 else None
+    # Each node has a sync and a native async implementation: `graph.invoke` uses the
+    # former, `graph.ainvoke` awaits the latter instead of parking a thread per LLM call.
+    builder.add_node(
+        "analyze_job_description",
+        RunnableLambda(analyze_job_description, afunc=aanalyze_job_description),
+        retry=retry)
+    builder.add_node(
+        "generate_application",
+        RunnableLambda(generate_application, afunc=agenerate_application))
+    builder.add_edge(START, "analyze_job_description")
+    builder.add_conditional_edges(
+        "analyze_job_description", is_suitable_condition,
+        {True: "generate_application", False: END})
+    builder.add_edge("generate_application", END)
+    return builder
+
+
+registry.register("job_application", build_job_application_graph)
+
+
+if __name__ == "__main__":
+    graph = registry.get("job_application")
+    res = graph.invoke({"job_description": "fake_jd"}, config={"configurable": {"model_provider": "fake"}})
+    print(res)
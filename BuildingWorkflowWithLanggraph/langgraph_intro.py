@@ -2,6 +2,7 @@ from typing_extensions import TypedDict
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
 from io import BytesIO
+from graph_diagram import draw_graph_png
 """
 LangGraph fundamentals
 Let's start with creating an agent that analyzes a provided job description 
@@ -39,9 +40,9 @@ res = graph.invoke({"job_description":"fake_jd"})
 print(res)
 
 from IPython.display import Image, display
-display(Image(graph.get_graph().draw_mermaid_png()))
+display(Image(draw_graph_png(graph)))
 
-png_bytes = graph.get_graph().draw_mermaid_png()
+png_bytes = draw_graph_png(graph)
 img = mpimg.imread(BytesIO(png_bytes))
 plt.imshow(img)
 plt.axis('off')
@@ -75,7 +76,7 @@ graph = builder.compile()
 res = graph.invoke({"job_description":"fake_jd"})
 print(res)
 
-png_bytes = graph.get_graph().draw_mermaid_png()
+png_bytes = draw_graph_png(graph)
 img = mpimg.imread(BytesIO(png_bytes))
 plt.imshow(img)
 plt.axis('off')
@@ -0,0 +1,202 @@
+"""Latency-aware load balancing over equivalent LLMs
+error_handling.py keeps a `llms` dict ("fake", "OPEN_AI") and picks one statically
+through `config["configurable"]["model_provider"]`. When several providers or
+deployments can serve the same model, pinning all traffic to one of them leaves the
+others idle and puts all of the tail latency in one place.
+
+`WeightedLLMBalancer` is a runnable over such a dict. Each request goes to a backend
+picked at random in proportion to its configured weight divided by its expected wait
+(latency EWMA times requests in flight plus one). A failed call is retried on another
+backend. A failure counts in the EWMA as at least the backend's usual latency times
+`failure_penalty`, however fast it came back, and puts the backend on a cooldown that
+doubles with each consecutive failure, so a dead backend stops getting traffic.
+With `sticky=True`, requests carrying the same `configurable["session_id"]` keep going
+to the same backend (weighted rendezvous hashing), which helps provider-side prompt caches.
+"""
+
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from typing import Optional
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+
+class Backend:
+
+    def __init__(self, name: str, llm: Runnable, weight: float = 1.0):
+        self.name = name
+        self.llm = llm
+        self.weight = weight
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def effective_weight(self, default_latency: float) -> float:
+        latency = self.latency_ewma if self.latency_ewma is not None else default_latency
+        return self.weight / (max(latency, 1e-6) * (self.in_flight + 1))
+
+
+class WeightedLLMBalancer(Runnable):
+
+    def __init__(self, llms: dict[str, Runnable], weights: dict[str, float] = None, alpha: float = 0.2,
+                 failure_penalty: float = 5.0, cooldown: float = 1.0, max_cooldown: float = 30.0,
+                 sticky: bool = False, max_attempts: int = None, seed: int = None):
+        if not llms:
+            raise ValueError("WeightedLLMBalancer needs at least one backend")
+        weights = weights or {}
+        self.backends = [Backend(name, llm, weights.get(name, 1.0)) for name, llm in llms.items()]
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.sticky = sticky
+        # Each attempt goes to a backend not tried yet for the request.
+        self.max_attempts = min(max_attempts or len(self.backends), len(self.backends))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _default_latency(self) -> float:
+        known = [b.latency_ewma for b in self.backends if b.latency_ewma is not None]
+        return sum(known) / len(known) if known else 1.0
+
+    def _sticky_pick(self, key: str, candidates: list[Backend]) -> Backend:
+        # Weighted rendezvous hashing: stable per key, and moves only that key's share
+        # when a backend appears or goes away.
+        def score(backend):
+            digest = hashlib.sha256(f"{key}:{backend.name}".encode()).digest()
+            u = (int.from_bytes(digest[:8], "big") + 1) / 2 ** 64
+            return -backend.weight / math.log(u)
+        return max(candidates, key=score)
+
+    def _acquire(self, exclude: set, session_id: Optional[str]) -> Backend:
+        with self._lock:
+            now = time.monotonic()
+            untried = [b for b in self.backends if b.name not in exclude]
+            candidates = [b for b in untried if b.is_available(now)]
+            if not candidates:
+                # Everything left is cooling down: try the one that comes back first
+                # rather than failing outright.
+                candidates = sorted(untried, key=lambda b: b.down_until)[:1]
+            if self.sticky and session_id is not None:
+                backend = self._sticky_pick(session_id, candidates)
+            else:
+                default_latency = self._default_latency()
+                weights = [b.effective_weight(default_latency) for b in candidates]
+                backend = self._rng.choices(candidates, weights)[0]
+            backend.in_flight += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend: Backend, elapsed: float, failed: bool):
+        with self._lock:
+            backend.in_flight -= 1
+            if failed:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                # A connection refused comes back in microseconds; it must not look fast.
+                usual = backend.latency_ewma if backend.latency_ewma is not None else self._default_latency()
+                elapsed = max(elapsed, usual) * self.failure_penalty
+                backoff = min(self.cooldown * 2 ** (backend.consecutive_failures - 1), self.max_cooldown)
+                backend.down_until = time.monotonic() + backoff
+            else:
+                backend.consecutive_failures = 0
+            if backend.latency_ewma is None:
+                backend.latency_ewma = elapsed
+            else:
+                backend.latency_ewma += self.alpha * (elapsed - backend.latency_ewma)
+
+    def invoke(self, input, config: RunnableConfig = None, **kwargs):
+        session_id = (config or {}).get("configurable", {}).get("session_id")
+        tried, last_error = set(), None
+        for _ in range(self.max_attempts):
+            backend = self._acquire(tried, session_id)
+            tried.add(backend.name)
+            start = time.perf_counter()
+            try:
+                result = backend.llm.invoke(input, config, **kwargs)
+            except Exception as e:
+                self._release(backend, time.perf_counter() - start, failed=True)
+                logger.warning(f"Backend {backend.name} failed: {e}")
+                last_error = e
+                continue
+            self._release(backend, time.perf_counter() - start, failed=False)
+            return result
+        raise last_error
+
+    async def ainvoke(self, input, config: RunnableConfig = None, **kwargs):
+        session_id = (config or {}).get("configurable", {}).get("session_id")
+        tried, last_error = set(), None
+        for _ in range(self.max_attempts):
+            backend = self._acquire(tried, session_id)
+            tried.add(backend.name)
+            start = time.perf_counter()
+            try:
+                result = await backend.llm.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                self._release(backend, time.perf_counter() - start, failed=True)
+                logger.warning(f"Backend {backend.name} failed: {e}")
+                last_error = e
+                continue
+            self._release(backend, time.perf_counter() - start, failed=False)
+            return result
+        raise last_error
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {b.name: {"requests": b.requests, "failures": b.failures, "in_flight": b.in_flight,
+                             "latency_ewma": b.latency_ewma, "weight": b.weight,
+                             "available": b.is_available(now)} for b in self.backends}
+
+
+"""
+Let's balance three fake deployments of the same model, one of them slow and one
+flaky, and compare tail latency with pinning everything to the slow one.
+"""
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from load_test_llm import LoadTestChatModel, LognormalLatency, ServerError
+    from job_application import llm_factories, registry
+
+    deployments = {
+        "eu": LoadTestChatModel(latency=LognormalLatency(0.05, 0.3), seed=1),
+        "us": LoadTestChatModel(latency=LognormalLatency(0.15, 0.6), seed=2),
+        "asia": LoadTestChatModel(latency=LognormalLatency(0.05, 0.3), error_rate=0.2,
+                                  errors={ServerError: 1}, seed=3),
+    }
+    balancer = WeightedLLMBalancer(deployments, weights={"eu": 1.0, "us": 1.0, "asia": 1.0}, seed=0)
+    llm_factories["balanced"] = lambda: balancer
+    llm_factories["pinned"] = lambda: deployments["us"]
+    graph = registry.get("job_application")
+
+    def timed(provider):
+        def run(i):
+            start = time.perf_counter()
+            graph.invoke({"job_description": f"jd {i}"}, {"configurable": {"model_provider": provider}})
+            return time.perf_counter() - start
+        return run
+
+    for provider in ("pinned", "balanced"):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            latencies = sorted(pool.map(timed(provider), range(400)))
+        print(f"{provider:>8}: p50 {latencies[200] * 1000:.0f} ms, p99 {latencies[396] * 1000:.0f} ms")
+    for name, stats in balancer.stats().items():
+        print(f"   {name}: {stats}")
+
+    sticky = WeightedLLMBalancer({"eu": deployments["eu"], "us": deployments["us"]}, sticky=True)
+    for _ in range(5):
+        sticky.invoke("Hello", {"configurable": {"session_id": "user-42"}})
+    print("sticky session user-42:", {name: s["requests"] for name, s in sticky.stats().items()})
@@ -0,0 +1,326 @@
+"""A fake LLM for load tests
+`MessagesIterator` in error_handling.py alternates between raising `ValueError` and
+answering "YES", which is enough to see a retry happen once. To load-test retries,
+fallbacks, rate limits and concurrency we need something closer to a real endpoint:
+latency that varies (with a heavy tail), errors of different types at a given rate,
+tokens that stream at a realistic pace, and token usage in the response.
+
+`LoadTestChatModel` is a regular LangChain chat model with those knobs, and
+`serve_openai_compatible` puts one behind a local HTTP server that speaks enough of the
+OpenAI chat completions API for `ChatOpenAI(base_url=...)` to use it.
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, convert_to_messages
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+
+class FixedLatency:
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def sample(self, rng: random.Random) -> float:
+        return self.seconds
+
+
+class LognormalLatency:
+    """Lognormal around `median`; sigma 0.5 puts p99 at about 3.2x the median."""
+
+    def __init__(self, median: float, sigma: float = 0.5):
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.lognormvariate(math.log(self.median), self.sigma)
+
+
+class HeavyTailLatency:
+    """A base distribution, plus with probability `tail_probability` a Pareto-distributed stall."""
+
+    def __init__(self, base, tail_probability: float = 0.01, tail_scale: float = 1.0, tail_alpha: float = 1.5):
+        self.base = base
+        self.tail_probability = tail_probability
+        self.tail_scale = tail_scale
+        self.tail_alpha = tail_alpha
+
+    def sample(self, rng: random.Random) -> float:
+        latency = self.base.sample(rng)
+        if rng.random() < self.tail_probability:
+            latency += self.tail_scale * rng.paretovariate(self.tail_alpha)
+        return latency
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class ServerError(Exception):
+    status_code = 500
+
+
+def count_tokens(text: str) -> int:
+    # Whitespace tokens, good enough for budgets and pacing in tests.
+    return len(text.split())
+
+
+class LoadTestChatModel(BaseChatModel):
+    """Chat model with configurable latency, failures, streaming pace and token usage.
+
+    `latency` is the time to the first token. With `tokens_per_second` the rest of the
+    answer takes `output_tokens / tokens_per_second` on top, both when streaming and not.
+    `errors` maps exception types to relative weights and `error_rate` is the
+    probability that a call fails (before any token is produced).
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    responses: Union[list[str], Callable[[list[BaseMessage]], str]] = ["YES"]
+    latency: Any = FixedLatency(0.0)
+    tokens_per_second: Optional[float] = None
+    error_rate: float = 0.0
+    errors: dict = {ValueError: 1.0}
+    seed: Optional[int] = None
+    model_name: str = "load-test"
+
+    _rng: random.Random = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "load-test"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _plan(self, messages: list[BaseMessage]):
+        """Decide everything random about one call up front: delays, failure, answer."""
+        with self._lock:
+            self._calls += 1
+            call = self._calls
+            first_token = self.latency.sample(self._rng)
+            error = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                types, weights = zip(*self.errors.items())
+                error = self._rng.choices(types, weights)[0](f"injected failure on call {call}")
+        if callable(self.responses):
+            content = self.responses(messages)
+        else:
+            content = self.responses[(call - 1) % len(self.responses)]
+        input_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        return first_token, error, content, input_tokens
+
+    def _usage(self, input_tokens: int, content: str) -> dict:
+        output_tokens = count_tokens(content)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _tokens(self, content: str) -> list[str]:
+        return [token for token in content.replace(" ", " \0").split("\0") if token]
+
+    def _generation_time(self, content: str) -> float:
+        return count_tokens(content) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _result(self, content: str, input_tokens: int) -> ChatResult:
+        usage = self._usage(input_tokens, content)
+        message = AIMessage(content=content, usage_metadata=usage,
+                            response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={"token_usage": usage, "model_name": self.model_name})
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        first_token, error, content, input_tokens = self._plan(messages)
+        time.sleep(first_token)
+        if error is not None:
+            raise error
+        time.sleep(self._generation_time(content))
+        return self._result(content, input_tokens)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        first_token, error, content, input_tokens = self._plan(messages)
+        await asyncio.sleep(first_token)
+        if error is not None:
+            raise error
+        await asyncio.sleep(self._generation_time(content))
+        return self._result(content, input_tokens)
+
+    def _stream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        first_token, error, content, input_tokens = self._plan(messages)
+        time.sleep(first_token)
+        if error is not None:
+            raise error
+        pause = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for i, token in enumerate(self._tokens(content)):
+            if i and pause:
+                time.sleep(pause)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(input_tokens, content)))
+
+    async def _astream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        first_token, error, content, input_tokens = self._plan(messages)
+        await asyncio.sleep(first_token)
+        if error is not None:
+            raise error
+        pause = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for i, token in enumerate(self._tokens(content)):
+            if i and pause:
+                await asyncio.sleep(pause)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(input_tokens, content)))
+
+
+"""
+An OpenAI-compatible stand-in
+`ChatOpenAI(base_url="http://127.0.0.1:<port>/v1", api_key="unused")` can talk to this.
+Injected errors become HTTP errors with the exception's `status_code` (500 otherwise),
+which the OpenAI client turns into its own exception types and retries like the real thing.
+"""
+
+
+def serve_openai_compatible(model: LoadTestChatModel, host: str = "127.0.0.1", port: int = 0):
+    """Start the server in a daemon thread; returns `(server, base_url)`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, error: Exception):
+            status = getattr(error, "status_code", 500)
+            self._json(status, {"error": {"message": str(error), "type": type(error).__name__, "code": status}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            messages = convert_to_messages([(m["role"], m["content"]) for m in request["messages"]])
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            name = request.get("model", model.model_name)
+            try:
+                if not request.get("stream"):
+                    message = model.invoke(messages)
+                    return self._json(200, {
+                        "id": completion_id, "object": "chat.completion", "created": created, "model": name,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": message.content}}],
+                        "usage": {"prompt_tokens": message.usage_metadata["input_tokens"],
+                                  "completion_tokens": message.usage_metadata["output_tokens"],
+                                  "total_tokens": message.usage_metadata["total_tokens"]},
+                    })
+                chunks = model.stream(messages)
+                first = next(chunks)
+            except Exception as e:
+                return self._error(e)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def send(delta: dict, finish_reason=None, usage=None):
+                event = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": name, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+                if usage is not None:
+                    event["choices"] = []
+                    event["usage"] = usage
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            send({"role": "assistant", "content": ""})
+            usage = None
+            for chunk in itertools.chain([first], chunks):
+                if chunk.usage_metadata:
+                    usage = chunk.usage_metadata
+                if chunk.content:
+                    send({"content": chunk.content})
+            send({}, finish_reason="stop")
+            if usage and request.get("stream_options", {}).get("include_usage"):
+                send({}, usage={"prompt_tokens": usage["input_tokens"],
+                                "completion_tokens": usage["output_tokens"],
+                                "total_tokens": usage["total_tokens"]})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from langchain_core.messages import HumanMessage
+
+    model = LoadTestChatModel(
+        responses=["YES", "NO", "Dear hiring manager, I am excited to apply for this position."],
+        latency=HeavyTailLatency(LognormalLatency(median=0.05, sigma=0.4), tail_probability=0.02, tail_scale=0.3),
+        tokens_per_second=200,
+        error_rate=0.1,
+        errors={RateLimitError: 3, ServerError: 1},
+        seed=42,
+    )
+
+    def timed_call(_):
+        start = time.perf_counter()
+        try:
+            model.invoke([HumanMessage(content="Is this job suitable?")])
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, type(e).__name__
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(timed_call, range(500)))
+    latencies = sorted(latency for latency, error in results if error is None)
+    errors = [error for _, error in results if error]
+    print(f"p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms, "
+          f"errors: { {e: errors.count(e) for e in set(errors)} }")
+
+    from langchain_openai import ChatOpenAI
+
+    server, base_url = serve_openai_compatible(model)
+    client = ChatOpenAI(model="gpt-4.1", base_url=base_url, api_key="unused", max_retries=3, stream_usage=True)
+    print(client.invoke("Tell me a joke about light bulbs!"))
+    print([chunk.content for chunk in client.stream("Write an application")])
+    server.shutdown()
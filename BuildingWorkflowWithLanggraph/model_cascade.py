@@ -0,0 +1,210 @@
+"""A model cascade for the suitability classifier
+`analyze_job_description` sends every job description to gpt-4.1, although most of them
+are easy YES/NO decisions that a small model gets right just as well, and faster.
+
+`SuitabilityCascade` asks the cheapest model first and only escalates when it isn't
+confident enough. Confidence comes either from the token logprobs of the answer
+(e.g. `ChatOpenAI(model="gpt-4.1-mini", logprobs=True, top_logprobs=5)`), or, for models
+without logprobs, from self-consistency: the share of `samples` answers that agree.
+The cascade keeps per-tier hit rates and an estimate of the latency it saved.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+
+from job_application import (
+    IsSuitableJobEnum, JobApplicationState, generate_application, is_suitable_condition, parser,
+    prompt_template_enum,
+)
+
+
+def logprob_confidence(message: BaseMessage, answer: str) -> Optional[float]:
+    """Probability mass the first answer token puts on `answer` (OpenAI logprobs format)."""
+    content = (message.response_metadata.get("logprobs") or {}).get("content")
+    if not content:
+        return None
+    first = content[0]
+    candidates = first.get("top_logprobs") or [first]
+    return min(1.0, sum(
+        math.exp(c["logprob"]) for c in candidates
+        if c["token"].strip() and answer.startswith(c["token"].strip().upper())
+    ))
+
+
+class CascadeTier:
+
+    def __init__(self, name: str, llm, threshold: float = 0.9, confidence: str = "logprobs", samples: int = 5):
+        if confidence not in ("logprobs", "self_consistency"):
+            raise ValueError(f"Unknown confidence method {confidence!r}")
+        self.name = name
+        self.llm = llm
+        self.threshold = threshold
+        self.confidence = confidence
+        self.samples = samples
+
+
+class SuitabilityCascade(Runnable):
+    """Classify a prompt with the first tier that is confident enough; the last tier always answers."""
+
+    def __init__(self, tiers: list[CascadeTier], parser=parser):
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier")
+        self.tiers = tiers
+        self.parser = parser
+        self._lock = threading.Lock()
+        self._stats = {t.name: {"calls": 0, "accepted": 0, "latency": 0.0} for t in tiers}
+        self._accepted_early: list[float] = []
+
+    def _score(self, tier: CascadeTier, messages: list[BaseMessage]):
+        if tier.confidence == "logprobs":
+            message = messages[0]
+            try:
+                answer = self.parser.invoke(message)
+            except Exception:
+                # An unparsable answer from a small model is just another reason to escalate.
+                return None, None
+            return answer, logprob_confidence(message, answer.value)
+        votes = Counter()
+        for message in messages:
+            try:
+                votes[self.parser.invoke(message)] += 1
+            except Exception:
+                pass
+        if not votes:
+            return None, 0.0
+        answer, count = votes.most_common(1)[0]
+        return answer, count / len(messages)
+
+    def _record(self, tier: CascadeTier, elapsed: float, accepted: bool, total_elapsed: float, final: bool):
+        with self._lock:
+            stats = self._stats[tier.name]
+            stats["calls"] += 1
+            stats["latency"] += elapsed
+            if accepted:
+                stats["accepted"] += 1
+                if not final:
+                    self._accepted_early.append(total_elapsed)
+
+    def _accept(self, tier: CascadeTier, answer, confidence, final: bool) -> bool:
+        if final:
+            return answer is not None
+        return answer is not None and confidence is not None and confidence >= tier.threshold
+
+    def invoke(self, input, config: RunnableConfig = None, **kwargs) -> IsSuitableJobEnum:
+        started = time.perf_counter()
+        for i, tier in enumerate(self.tiers):
+            final = i == len(self.tiers) - 1
+            start = time.perf_counter()
+            n = tier.samples if tier.confidence == "self_consistency" else 1
+            messages = tier.llm.batch([input] * n, config) if n > 1 else [tier.llm.invoke(input, config)]
+            answer, confidence = self._score(tier, messages)
+            accepted = self._accept(tier, answer, confidence, final)
+            self._record(tier, time.perf_counter() - start, accepted, time.perf_counter() - started, final)
+            if accepted:
+                return answer
+        raise ValueError("No tier produced a parsable answer")
+
+    async def ainvoke(self, input, config: RunnableConfig = None, **kwargs) -> IsSuitableJobEnum:
+        started = time.perf_counter()
+        for i, tier in enumerate(self.tiers):
+            final = i == len(self.tiers) - 1
+            start = time.perf_counter()
+            n = tier.samples if tier.confidence == "self_consistency" else 1
+            messages = await asyncio.gather(*(tier.llm.ainvoke(input, config) for _ in range(n)))
+            answer, confidence = self._score(tier, list(messages))
+            accepted = self._accept(tier, answer, confidence, final)
+            self._record(tier, time.perf_counter() - start, accepted, time.perf_counter() - started, final)
+            if accepted:
+                return answer
+        raise ValueError("No tier produced a parsable answer")
+
+    def stats(self) -> dict:
+        """Per-tier calls, hit rate and mean latency, plus the latency saved by early answers.
+
+        Savings are estimated against the mean latency of the last tier, i.e. what the
+        early-answered requests would have cost had they all gone to the big model.
+        """
+        with self._lock:
+            tiers = {
+                name: {
+                    "calls": s["calls"],
+                    "hit_rate": s["accepted"] / s["calls"] if s["calls"] else 0.0,
+                    "mean_latency": s["latency"] / s["calls"] if s["calls"] else 0.0,
+                }
+                for name, s in self._stats.items()
+            }
+            last = tiers[self.tiers[-1].name]
+            saved = None
+            if last["calls"]:
+                saved = sum(last["mean_latency"] - spent for spent in self._accepted_early)
+            return {"tiers": tiers, "answered_early": len(self._accepted_early), "latency_saved": saved}
+
+
+def make_cascade_node(cascade: SuitabilityCascade):
+    def analyze_job_description(state: JobApplicationState, config: RunnableConfig):
+        prompt = prompt_template_enum.format(job_description=state["job_description"])
+        return {"is_suitable": cascade.invoke(prompt), "actions": ["action1"]}
+
+    async def aanalyze_job_description(state: JobApplicationState, config: RunnableConfig):
+        prompt = prompt_template_enum.format(job_description=state["job_description"])
+        return {"is_suitable": await cascade.ainvoke(prompt), "actions": ["action1"]}
+
+    return analyze_job_description, aanalyze_job_description
+
+
+def build_cascade_graph(cascade: SuitabilityCascade) -> StateGraph:
+    analyze, aanalyze = make_cascade_node(cascade)
+    builder = StateGraph(JobApplicationState)
+    builder.add_node("analyze_job_description", RunnableLambda(analyze, afunc=aanalyze))
+    builder.add_node("generate_application", generate_application)
+    builder.add_edge(START, "analyze_job_description")
+    builder.add_conditional_edges(
+        "analyze_job_description", is_suitable_condition,
+        {True: "generate_application", False: END})
+    builder.add_edge("generate_application", END)
+    return builder
+
+
+"""
+Let's simulate it: the small model is fast and sure about most job descriptions but
+hesitant on the "hard" ones, the big model is slow and always sure.
+"""
+if __name__ == "__main__":
+    import random
+    from langchain_core.messages import AIMessage
+
+    def fake_model(latency: float, hard_confidence: float):
+        def answer(prompt):
+            time.sleep(latency)
+            text = str(prompt)
+            p = hard_confidence if "hard" in text else 0.98
+            token = "YES" if "Java" in text else "NO"
+            logprobs = {"content": [{"token": token, "logprob": math.log(p), "top_logprobs": [
+                {"token": token, "logprob": math.log(p)},
+                {"token": "NO" if token == "YES" else "YES", "logprob": math.log(1 - p + 1e-9)},
+            ]}]}
+            return AIMessage(content=token, response_metadata={"logprobs": logprobs})
+        return RunnableLambda(answer)
+
+    cascade = SuitabilityCascade([
+        CascadeTier("small", fake_model(0.02, hard_confidence=0.6), threshold=0.9),
+        CascadeTier("big", fake_model(0.2, hard_confidence=0.99)),
+    ])
+    graph = build_cascade_graph(cascade).compile()
+    random.seed(0)
+    jds = [f"{random.choice(['Java', 'Python'])} developer{' (hard)' if random.random() < 0.2 else ''}"
+           for _ in range(50)]
+    start = time.perf_counter()
+    for jd in jds:
+        graph.invoke({"job_description": jd})
+    print(f"{len(jds)} runs in {time.perf_counter() - start:.2f}s")
+    print(cascade.stats())
@@ -0,0 +1,269 @@
+"""Memoizing nodes on the state they read
+Re-running the job-application graph on input it has seen before (a retry after a later
+step failed, the same posting in two batches, switching back to a model we tried) runs
+every node again, including the LLM call in `analyze_job_description`.
+
+`memoized` wraps a node that declares what it depends on: the state keys it reads and
+the `configurable` keys it uses. Its update is cached under a hash of those values (plus
+the node name and a `version` to bump when the node's code changes), in a bounded
+in-memory LRU and, optionally, on disk so the cache outlives the process; the disk tier
+drops its least recently used files beyond `max_disk_bytes`. On a hit the node doesn't
+run. The disk entries are pickles, see `NodeCache` about where they may live. Per run,
+`configurable["node_cache"] = False` bypasses the cache and
+`configurable["node_cache_refresh"] = [...]` recomputes the listed nodes.
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+
+from delta_streaming import encode_frame
+from graph_registry import registry
+from node_wrapping import NodeWrapper, as_runnable
+from job_application import (
+    JobApplicationState, aanalyze_job_description, agenerate_application, analyze_job_description,
+    generate_application, is_suitable_condition,
+)
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class NodeCache:
+    """LRU of `max_entries` updates in memory, backed by pickles under `cache_dir` if given.
+
+    The files under `cache_dir` are unpickled when read, which runs code they name: only
+    point it at a directory nothing untrusted can write to.
+    """
+
+    def __init__(self, max_entries: int = 1024, cache_dir: str = None, max_disk_bytes: int = 256 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for directory, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.endswith(".pkl"):
+                    continue
+                path = os.path.join(directory, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _account(self, size: int) -> None:
+        # Other processes may share the directory, so the running total is only a trigger;
+        # pruning recounts from the files themselves.
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            entries = sorted(self._disk_entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._disk_bytes = total
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            value = self._memory.get(key, MISSING)
+            if value is not MISSING:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return value
+        if self.cache_dir:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                os.utime(path)
+            except FileNotFoundError:
+                value = MISSING
+            except Exception as e:
+                # Truncated, or pickled by code that has changed since (a renamed class or
+                # module, a different enum): treat it as a miss and recompute.
+                logger.warning(f"Dropping unreadable cache entry {path}: {type(e).__name__}: {e}")
+                value = MISSING
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if value is not MISSING:
+                self._remember(key, value)
+                with self._lock:
+                    self.hits["disk"] += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return MISSING
+
+    def put(self, key: str, value: Any) -> None:
+        self._remember(key, value)
+        if self.cache_dir:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp_path, path)
+            self._account(size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+
+def node_key(name: str, version: str, state: dict, reads: tuple, configurable: dict, config_keys: tuple) -> str:
+    frame = {
+        "node": name, "version": version,
+        "state": {k: state.get(k) for k in reads},
+        "config": {k: configurable.get(k) for k in config_keys},
+    }
+    return hashlib.sha256(encode_frame(frame)).hexdigest()
+
+
+class Memoized(NodeWrapper):
+    """Runs a node only when the state and config it declares haven't been seen before."""
+
+    def __init__(self, runnable: Runnable, reads: tuple, config_keys: tuple, cache: NodeCache,
+                 version: str, strict: bool, name: str = None):
+        super().__init__(runnable, name)
+        self.reads = tuple(reads)
+        self.config_keys = tuple(config_keys)
+        self.cache = cache
+        self.version = version
+        self.strict = strict
+
+    def _lookup(self, state: dict, config: Optional[RunnableConfig]):
+        configurable = (config or {}).get("configurable", {})
+        if configurable.get("node_cache") is False:
+            return None, MISSING
+        key = node_key(self.name, self.version, state, self.reads, configurable, self.config_keys)
+        if self.name in configurable.get("node_cache_refresh", ()):
+            return key, MISSING
+        return key, self.cache.get(key)
+
+    def _input(self, state: dict) -> dict:
+        # In strict mode the node only sees what it declared, so a missing key fails loudly.
+        return {k: state[k] for k in self.reads if k in state} if self.strict else state
+
+    def _store(self, key: Optional[str], update):
+        if key is not None:
+            self.cache.put(key, copy.deepcopy(update))
+        return update
+
+    def invoke(self, state: dict, config: RunnableConfig = None, **kwargs):
+        key, cached = self._lookup(state, config)
+        if cached is not MISSING:
+            logger.info(f"Skipping {self.name}: cached")
+            return copy.deepcopy(cached)
+        return self._store(key, self.runnable.invoke(self._input(state), config, **kwargs))
+
+    async def ainvoke(self, state: dict, config: RunnableConfig = None, **kwargs):
+        key, cached = self._lookup(state, config)
+        if cached is not MISSING:
+            logger.info(f"Skipping {self.name}: cached")
+            return copy.deepcopy(cached)
+        return self._store(key, await self.runnable.ainvoke(self._input(state), config, **kwargs))
+
+
+def memoized(node, reads: tuple, config_keys: tuple = (), cache: NodeCache = None, name: str = None,
+             version: str = "1", strict: bool = False) -> Memoized:
+    return Memoized(as_runnable(node), reads, config_keys, cache or node_cache, version, strict, name)
+
+
+# Shared by the nodes of the memoized job-application graph.
+node_cache = NodeCache()
+
+
+def build_memoized_job_application_graph(cache: NodeCache = None) -> StateGraph:
+    cache = cache or node_cache
+    builder = StateGraph(JobApplicationState)
+    builder.add_node("analyze_job_description", memoized(
+        RunnableLambda(analyze_job_description, afunc=aanalyze_job_description),
+        reads=("job_description",), config_keys=("model_provider", "model_name"), cache=cache,
+        name="analyze_job_description"))
+    builder.add_node("generate_application", memoized(
+        RunnableLambda(generate_application, afunc=agenerate_application),
+        reads=("job_description", "is_suitable"), config_keys=("model_provider", "model_name"), cache=cache,
+        name="generate_application"))
+    builder.add_edge(START, "analyze_job_description")
+    builder.add_conditional_edges(
+        "analyze_job_description", is_suitable_condition,
+        {True: "generate_application", False: END})
+    builder.add_edge("generate_application", END)
+    return builder
+
+
+registry.register("job_application_memoized", build_memoized_job_application_graph)
+
+
+"""
+Let's compare two models on the same job description, going back and forth between
+them, with a slow model behind the analysis. Then start over with an empty memory
+tier and only the disk cache, as a new process would.
+"""
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from job_application import llm_factories
+    from load_test_llm import FixedLatency, LoadTestChatModel
+
+    llm_factories["slow"] = lambda: LoadTestChatModel(responses=lambda messages: "YES", latency=FixedLatency(0.5))
+    cache = NodeCache(max_entries=128, cache_dir=tempfile.mkdtemp())
+    graph = build_memoized_job_application_graph(cache).compile()
+    job = {"job_description": "Java developer with Spring experience"}
+
+    for model_name in ("gpt-4.1", "gpt-4.1-mini", "gpt-4.1", "gpt-4.1-mini"):
+        start = time.perf_counter()
+        graph.invoke(job, {"configurable": {"model_provider": "slow", "model_name": model_name}})
+        print(f"model_name={model_name:<13} {time.perf_counter() - start:.3f}s  hits={cache.hits} misses={cache.misses}")
+
+    cache.clear()
+    start = time.perf_counter()
+    state = graph.invoke(job, {"configurable": {"model_provider": "slow", "model_name": "gpt-4.1"}})
+    print(f"memory cleared:             {time.perf_counter() - start:.3f}s  hits={cache.hits} -> {state['is_suitable']}")
+
+    start = time.perf_counter()
+    graph.invoke(job, {"configurable": {"model_provider": "slow", "model_name": "gpt-4.1",
+                                        "node_cache_refresh": ["analyze_job_description"]}})
+    print(f"refresh analyze:            {time.perf_counter() - start:.3f}s")
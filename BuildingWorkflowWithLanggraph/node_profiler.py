@@ -0,0 +1,304 @@
+"""Opt-in CPU and allocation profiling of single nodes
+When one node of a deployed graph gets slow we can't see inside it without shipping
+instrumented code. `profiled` wraps a node (or any runnable, e.g. an LCEL chain) so it
+can be profiled per invocation from `RunnableConfig["configurable"]`:
+
+    {"configurable": {"profile_nodes": ["analyze_job_description"], "profile_dir": "profiles"}}
+
+For each listed node that runs, a sampling profiler records the node's call stacks into
+`<profile_dir>/<node>-<timestamp>.collapsed` (the collapsed-stack format that
+flamegraph.pl, speedscope and inferno read), and tracemalloc writes the peak memory of
+the call and its top allocation sites, near the peak and at the end, to
+`<node>-<timestamp>.alloc.txt`. Nodes that aren't listed just pay
+for one dict lookup. Graphs compiled through graph_registry.py are instrumented this way.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig
+
+from node_wrapping import NodeWrapper, as_runnable, wrap_nodes
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Samples the stack of one thread every `interval` seconds from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class PeakTracker:
+    """Snapshots tracemalloc each time traced memory grows `growth` times past its last high.
+
+    Polls from a background thread every `interval` seconds, so memory that is allocated
+    and freed again inside the call still shows up in the snapshot nearest its peak.
+    """
+
+    def __init__(self, interval: float = 0.005, growth: float = 1.1):
+        self.interval = interval
+        self.growth = growth
+        self.start_bytes = tracemalloc.get_traced_memory()[0]
+        self.high_bytes = self.start_bytes
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def poll(self):
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.high_bytes * self.growth or (self.snapshot is None and current > self.start_bytes):
+            self.snapshot = tracemalloc.take_snapshot()
+            self.high_bytes = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.poll()
+
+
+def write_allocations(before: tracemalloc.Snapshot, at_peak: tracemalloc.Snapshot, after: tracemalloc.Snapshot,
+                      peak_bytes: int, path: str, top_n: int):
+    # Only tracemalloc's own bookkeeping is left out; user code in any file is kept.
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    before = before.filter_traces(ignore)
+    with open(path, "w") as f:
+        f.write(f"Peak {peak_bytes / 1024:.1f} KiB above the start of the call\n\n")
+        for title, snapshot in (("near the peak", at_peak), ("still held at the end", after)):
+            f.write(f"Top {top_n} allocation sites {title}, by size difference\n")
+            for stat in snapshot.filter_traces(ignore).compare_to(before, "lineno")[:top_n]:
+                f.write(f"{stat}\n")
+            f.write("\n")
+
+
+# tracemalloc is process-wide: it stays on while any profile is active, and is only
+# stopped by the last one out, and only if a profile turned it on.
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+class _Session:
+
+    def __init__(self, name: str, profile_dir: str, interval: float, top_n: int):
+        os.makedirs(profile_dir, exist_ok=True)
+        self.name = name
+        self.top_n = top_n
+        self.prefix = os.path.join(
+            profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns() % 10**6}")
+        _acquire_tracing()
+        try:
+            self.before = tracemalloc.take_snapshot()
+            # The traced-memory peak is process-wide, so profiles running at the same time
+            # share it.
+            tracemalloc.reset_peak()
+            self.peaks = PeakTracker()
+            self.peaks.start()
+            self.sampler = StackSampler(threading.get_ident(), interval)
+            self.sampler.start()
+        except Exception:
+            _release_tracing()
+            raise
+        self.start = time.perf_counter()
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.start
+        self.sampler.stop()
+        try:
+            self.peaks.stop()
+            peak_bytes = tracemalloc.get_traced_memory()[1] - self.peaks.start_bytes
+            after = tracemalloc.take_snapshot()
+        finally:
+            _release_tracing()
+        self.sampler.write(f"{self.prefix}.collapsed")
+        write_allocations(self.before, self.peaks.snapshot or after, after, peak_bytes,
+                          f"{self.prefix}.alloc.txt", self.top_n)
+        logger.info(f"Profiled {self.name} in {elapsed:.3f}s, {sum(self.sampler.stacks.values())} samples "
+                    f"-> {self.prefix}.*")
+
+
+@contextmanager
+def profile(name: str, profile_dir: str = "profiles", interval: float = 0.001, top_n: int = 10):
+    """Profile the code in the `with` block, which runs on the current thread.
+
+    A failure of the profiler itself is logged, never raised into the profiled code.
+    """
+    try:
+        session = _Session(name, profile_dir, interval, top_n)
+    except Exception:
+        logger.exception(f"Could not start profiling {name}")
+        session = None
+    try:
+        yield session.prefix if session else None
+    finally:
+        if session is not None:
+            try:
+                session.finish()
+            except Exception:
+                logger.exception(f"Could not write the profile of {name}")
+
+
+def _options(config: RunnableConfig, name: str):
+    configurable = config.get("configurable", {}) if config else {}
+    nodes = configurable.get("profile_nodes")
+    if not nodes or name not in nodes:
+        return None
+    return {
+        "profile_dir": configurable.get("profile_dir", "profiles"),
+        "interval": configurable.get("profile_interval", 0.001),
+        "top_n": configurable.get("profile_top_n", 10),
+    }
+
+
+class Profiled(NodeWrapper):
+    """Runs `runnable`, under the profiler when its name is in `profile_nodes`.
+
+    For an async node the sampler follows the event loop thread, so other tasks running
+    at the same time show up in its stacks too.
+    """
+
+    def invoke(self, input, config: RunnableConfig = None, **kwargs):
+        options = _options(config, self.name)
+        if options is None:
+            return self.runnable.invoke(input, config, **kwargs)
+        with profile(self.name, **options):
+            return self.runnable.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config: RunnableConfig = None, **kwargs):
+        options = _options(config, self.name)
+        if options is None:
+            return await self.runnable.ainvoke(input, config, **kwargs)
+        with profile(self.name, **options):
+            return await self.runnable.ainvoke(input, config, **kwargs)
+
+
+def profiled(node: Callable, name: str = None) -> Runnable:
+    """Wrap a node or runnable so it is profiled when its name is in `profile_nodes`."""
+    return Profiled(as_runnable(node), name)
+
+
+def instrument(builder):
+    """Make every node of a `StateGraph` builder profilable; call before `compile()`."""
+    return wrap_nodes(builder, lambda runnable, name: runnable if isinstance(runnable, Profiled)
+                      else profiled(runnable, name))
+
+
+"""
+Let's profile only the application-writing node of a graph whose nodes burn some CPU,
+then check how much the unused hooks cost on the fast path.
+"""
+if __name__ == "__main__":
+    import re
+    import tempfile
+    from langgraph.graph import StateGraph, START, END
+    from job_application import JobApplicationState
+
+    def tokenize(text):
+        return re.findall(r"\w+", text.lower())
+
+    def analyze_job_description(state: JobApplicationState):
+        words = Counter(tokenize(state["job_description"]))
+        return {"is_suitable": "YES" if words["java"] else "NO", "actions": ["action1"]}
+
+    def generate_application(state: JobApplicationState):
+        paragraphs = [" ".join(sorted(tokenize(state["job_description"]))[:50]) for _ in range(200)]
+        blob = [p.upper() for p in paragraphs]
+        return {"application": blob[0][:100], "actions": ["action2"]}
+
+    def build(instrumented: bool):
+        builder = StateGraph(JobApplicationState)
+        builder.add_node("analyze_job_description", analyze_job_description)
+        builder.add_node("generate_application", generate_application)
+        builder.add_edge(START, "analyze_job_description")
+        builder.add_edge("analyze_job_description", "generate_application")
+        builder.add_edge("generate_application", END)
+        return (instrument(builder) if instrumented else builder).compile()
+
+    state = {"job_description": "Java developer with Spring and SQL " * 200}
+    profile_dir = tempfile.mkdtemp()
+    graph = build(instrumented=True)
+    graph.invoke(state, {"configurable": {"profile_nodes": ["generate_application"], "profile_dir": profile_dir}})
+    for file in sorted(os.listdir(profile_dir)):
+        print(f"--- {file}")
+        with open(os.path.join(profile_dir, file)) as f:
+            print("".join(f.readlines()[:6]))
+
+    light = {"job_description": "Java developer"}
+    for instrumented in (False, True):
+        g = build(instrumented)
+        start = time.perf_counter()
+        for _ in range(500):
+            g.invoke(light)
+        print(f"instrumented={instrumented}: {(time.perf_counter() - start) / 500 * 1e6:.0f} us per run, profiling off")
+
+    # The registered job-application graph has the hooks already: no rebuild needed.
+    from graph_registry import registry
+    registered_dir = tempfile.mkdtemp()
+    registry.get("job_application").invoke(light, {"configurable": {
+        "model_provider": "fake", "profile_nodes": ["analyze_job_description"], "profile_dir": registered_dir}})
+    print("registered graph:", sorted(os.listdir(registered_dir)))
@@ -0,0 +1,32 @@
+"""Wrapping the nodes of a graph
+Profiling, validation and similar cross-cutting concerns wrap every node of a
+`StateGraph` builder in a runnable that does its work around the node's own call.
+
+`NodeWrapper` is the base for those wrappers: it keeps the wrapped runnable and the node
+name, and subclasses call `self.runnable` directly. Going through `RunnableLambda` would
+start a callback run of its own for every step, which costs more than the wrapper itself
+when the wrapper has nothing to do. `wrap_nodes` swaps the runnable of every node of a
+builder for its wrapped version.
+"""
+
+from typing import Callable
+
+from langchain_core.runnables import Runnable, RunnableLambda
+
+
+def as_runnable(node) -> Runnable:
+    return node if isinstance(node, Runnable) else RunnableLambda(node)
+
+
+class NodeWrapper(Runnable):
+
+    def __init__(self, runnable: Runnable, name: str = None):
+        self.runnable = runnable
+        self.name = name or runnable.get_name()
+
+
+def wrap_nodes(builder, wrap: Callable[[Runnable, str], Runnable]):
+    """Replace each node of a `StateGraph` builder by `wrap(runnable, name)`; call before `compile()`."""
+    for name, spec in list(builder.nodes.items()):
+        builder.nodes[name] = spec._replace(runnable=wrap(spec.runnable, name))
+    return builder
@@ -2,6 +2,7 @@ from typing_extensions import TypedDict
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
 from io import BytesIO
+from graph_diagram import draw_graph_png
 from langgraph.graph import StateGraph, START, END, Graph
 
 """
@@ -50,7 +51,7 @@ for chunk in graph.stream(
     print(chunk)
     print("\n\n")
 
-png_bytes = graph.get_graph().draw_mermaid_png()
+png_bytes = draw_graph_png(graph)
 img = mpimg.imread(BytesIO(png_bytes))
 plt.imshow(img)
 plt.axis('off')
@@ -145,7 +146,7 @@ for chunk in graph.stream(
     print(chunk)
     print("\n\n")
     
-png_bytes = graph.get_graph().draw_mermaid_png()
+png_bytes = draw_graph_png(graph)
 img = mpimg.imread(BytesIO(png_bytes))
 plt.imshow(img)
 plt.axis('off')
@@ -0,0 +1,207 @@
+"""Validation policies for Pydantic graph state
+With a Pydantic model as the graph state (instead of the `JobApplicationState` TypedDict),
+the state is validated or coerced on every step, and on a state that carries lists of
+nested models that costs more than the nodes themselves.
+
+Here the graph runs on a TypedDict generated from the Pydantic model (same fields, same
+`Annotated` reducers), and validation against the model becomes a policy, chosen per
+run with `configurable["validation_policy"]`:
+
+    "all"       validate the input, every node's input state and update, and the output
+    "boundary"  validate only the graph input and the final output
+    "sampled"   like "boundary", plus all-style checks on a `validation_sample_rate` share of steps
+    "off"       no validation
+
+`ValidatedGraph` validates the boundaries and passes the policy down; nodes wrapped by
+`add_validation` check their steps when the policy asks for it.
+"""
+
+import random
+import typing
+from typing import Optional
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+from node_wrapping import NodeWrapper, as_runnable, wrap_nodes
+
+POLICIES = ("all", "boundary", "sampled", "off")
+
+
+def typed_dict_from_model(model: type[BaseModel]) -> type:
+    """A TypedDict with the model's fields, keeping `Annotated[..., reducer]` hints."""
+    hints = typing.get_type_hints(model, include_extras=True)
+    return TypedDict(f"{model.__name__}Dict", {name: hints[name] for name in model.model_fields}, total=False)
+
+
+class StateValidator:
+
+    def __init__(self, model: type[BaseModel], sample_rate: float = 0.1, seed: int = None):
+        self.model = model
+        self.sample_rate = sample_rate
+        self._rng = random.Random(seed)
+        hints = typing.get_type_hints(model)
+        self._fields = {name: TypeAdapter(hints[name]) for name in model.model_fields}
+        self.validations = 0
+
+    def validate_state(self, state: dict) -> dict:
+        """Validate a full state; returns it with values coerced to the field types.
+
+        Values come back dumped (nested models as dicts), as they are with validation off,
+        so the policy never changes what nodes receive.
+        """
+        self.validations += 1
+        validated = self.model.model_validate(state)
+        return validated.model_dump(include={name for name in state if name in self._fields})
+
+    def validate_update(self, update: Optional[dict]) -> Optional[dict]:
+        """Validate only the fields a node returned."""
+        if not isinstance(update, dict):
+            return update
+        self.validations += 1
+        return {name: self._dump(name, value) if name in self._fields else value for name, value in update.items()}
+
+    def _dump(self, name: str, value):
+        adapter = self._fields[name]
+        return adapter.dump_python(adapter.validate_python(value))
+
+    def check_step(self, config: RunnableConfig) -> bool:
+        configurable = (config or {}).get("configurable", {})
+        policy = configurable.get("validation_policy", "boundary")
+        if policy == "all":
+            return True
+        if policy == "sampled":
+            return self._rng.random() < configurable.get("validation_sample_rate", self.sample_rate)
+        return False
+
+
+class Validating(NodeWrapper):
+    """Runs a node, validating its input state and update on the steps the policy picks."""
+
+    def __init__(self, runnable: Runnable, validator: StateValidator, name: str = None):
+        super().__init__(runnable, name)
+        self.validator = validator
+
+    def invoke(self, state, config: RunnableConfig = None, **kwargs):
+        if not self.validator.check_step(config):
+            return self.runnable.invoke(state, config, **kwargs)
+        update = self.runnable.invoke(self.validator.validate_state(state), config, **kwargs)
+        return self.validator.validate_update(update)
+
+    async def ainvoke(self, state, config: RunnableConfig = None, **kwargs):
+        if not self.validator.check_step(config):
+            return await self.runnable.ainvoke(state, config, **kwargs)
+        update = await self.runnable.ainvoke(self.validator.validate_state(state), config, **kwargs)
+        return self.validator.validate_update(update)
+
+
+def validating(node, validator: StateValidator, name: str = None) -> Runnable:
+    return Validating(as_runnable(node), validator, name)
+
+
+def add_validation(builder, validator: StateValidator):
+    """Wrap every node of a `StateGraph` builder; call before `compile()`."""
+    return wrap_nodes(builder, lambda runnable, name: validating(runnable, validator, name))
+
+
+class ValidatedGraph(Runnable):
+    """A compiled graph whose input and output are validated unless the policy is "off"."""
+
+    def __init__(self, graph, validator: StateValidator, policy: str = "boundary"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown validation policy {policy!r}, expected one of {POLICIES}")
+        self.graph = graph
+        self.validator = validator
+        self.policy = policy
+
+    def _config(self, config: Optional[RunnableConfig]) -> tuple[str, RunnableConfig]:
+        config = dict(config or {})
+        configurable = {"validation_policy": self.policy, **config.get("configurable", {})}
+        if configurable["validation_policy"] not in POLICIES:
+            raise ValueError(f"Unknown validation policy {configurable['validation_policy']!r}")
+        return configurable["validation_policy"], {**config, "configurable": configurable}
+
+    def invoke(self, input: dict, config: RunnableConfig = None, **kwargs) -> dict:
+        policy, config = self._config(config)
+        if policy != "off":
+            input = self.validator.validate_state(input)
+        output = self.graph.invoke(input, config, **kwargs)
+        return self.validator.validate_state(output) if policy != "off" else output
+
+    async def ainvoke(self, input: dict, config: RunnableConfig = None, **kwargs) -> dict:
+        policy, config = self._config(config)
+        if policy != "off":
+            input = self.validator.validate_state(input)
+        output = await self.graph.ainvoke(input, config, **kwargs)
+        return self.validator.validate_state(output) if policy != "off" else output
+
+
+"""
+Benchmark: per-step overhead of each policy for a looping graph as its state grows,
+next to the same graph with the Pydantic model as its LangGraph state schema.
+"""
+if __name__ == "__main__":
+    import time
+    from operator import add
+    from typing import Annotated
+    from langgraph.graph import StateGraph, START, END
+
+    class Document(BaseModel):
+        title: str
+        body: str
+        score: float
+
+    class JobApplicationModel(BaseModel):
+        job_description: str
+        is_suitable: Optional[str] = None
+        application: Optional[str] = None
+        documents: list[Document] = []
+        actions: Annotated[list[str], add] = []
+
+    steps = 50
+
+    def actions(state):
+        # Nodes of the Pydantic-state graph get model instances, the others get dicts.
+        return state["actions"] if isinstance(state, dict) else state.actions
+
+    def revise(state):
+        return {"application": f"draft {len(actions(state))}", "actions": ["revise"]}
+
+    def keep_going(state):
+        return "revise" if len(actions(state)) < steps else END
+
+    def build(schema):
+        builder = StateGraph(schema)
+        builder.add_node("revise", revise)
+        builder.add_edge(START, "revise")
+        builder.add_conditional_edges("revise", keep_going, ["revise", END])
+        return builder
+
+    def per_step(graph, input, config=None, runs=3):
+        config = {**(config or {}), "recursion_limit": steps * 2}
+        start = time.perf_counter()
+        for _ in range(runs):
+            graph.invoke(input, config)
+        return (time.perf_counter() - start) / runs / steps * 1e6
+
+    validator = StateValidator(JobApplicationModel, seed=0)
+    fast = ValidatedGraph(add_validation(build(typed_dict_from_model(JobApplicationModel)), validator).compile(),
+                          validator)
+    pydantic_graph = build(JobApplicationModel).compile()
+
+    print(f"{'documents':>9} {'pydantic state':>15} " + " ".join(f"{p:>10}" for p in POLICIES) + "  (us/step)")
+    for size in (0, 100, 1_000):
+        documents = [{"title": f"doc {i}", "body": "lorem ipsum " * 20, "score": i / 7} for i in range(size)]
+        input = {"job_description": "Java developer", "documents": documents}
+        row = [per_step(pydantic_graph, input)]
+        for policy in POLICIES:
+            row.append(per_step(fast, input, {"configurable": {"validation_policy": policy,
+                                                                 "validation_sample_rate": 0.1}}))
+        print(f"{size:>9} {row[0]:>15.0f} " + " ".join(f"{v:>10.0f}" for v in row[1:]))
+
+    try:
+        fast.invoke({"job_description": "Java developer", "documents": [{"title": "no body"}]})
+    except Exception as e:
+        print(f"boundary still rejects bad input: {type(e).__name__}, {e.error_count()} errors")
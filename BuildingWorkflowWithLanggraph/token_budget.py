@@ -0,0 +1,286 @@
+"""Token and cost budgets per graph run
+Nothing in our graphs keeps track of how many tokens a run has used, so a long job
+description or a node that loops can run up both latency and cost without limit.
+
+`run_with_budget` reads the budget from `RunnableConfig["configurable"]`, next to the
+`model_provider` / `model_name` keys the nodes already use:
+
+    {"configurable": {"model_provider": "OPEN_AI", "model_name": "gpt-4.1",
+                      "token_budget": 20_000, "cost_budget": 0.05, "tenant_id": "acme",
+                      "downgrade_at": 0.8,
+                      "downgrade_to": {"model_provider": "OPEN_AI", "model_name": "gpt-4.1-mini"}}}
+
+A callback handler counts the tokens every LLM call reports. Nodes wrapped with
+`budget_aware` see the `downgrade_to` model once `downgrade_at` of the budget is used,
+and once it is used up the next node doesn't start: the run stops and returns the
+state it has so far, marked as partial. A `model_name` in `downgrade_to` reaches every
+node that looks its model up with `get_llm(model_provider, model_name)`, the classifier
+chain of job_application.py included, and is only accepted for a provider whose factory
+takes a model name.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig
+
+from node_wrapping import NodeWrapper, as_runnable
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class TenantBudgets:
+    """Token allowance per tenant, shared by all runs in the process."""
+
+    def __init__(self, limits: dict[str, int], default: Optional[int] = None):
+        self.limits = dict(limits)
+        self.default = default
+        self.used: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def limit(self, tenant_id: str) -> Optional[int]:
+        return self.limits.get(tenant_id, self.default)
+
+    def remaining(self, tenant_id: str) -> Optional[float]:
+        limit = self.limit(tenant_id)
+        if limit is None:
+            return None
+        with self._lock:
+            return limit - self.used.get(tenant_id, 0)
+
+    def charge(self, tenant_id: str, tokens: int) -> None:
+        with self._lock:
+            self.used[tenant_id] = self.used.get(tenant_id, 0) + tokens
+
+    def reset(self, tenant_id: str = None) -> None:
+        with self._lock:
+            if tenant_id is None:
+                self.used.clear()
+            else:
+                self.used.pop(tenant_id, None)
+
+
+class TokenBudget(BaseCallbackHandler):
+    """Counts tokens and cost of one run and tells whether to downgrade or stop.
+
+    `prices` maps a model name to USD per 1k tokens (input and output alike, to keep it
+    simple); calls to models without a price count towards tokens only.
+    """
+
+    def __init__(self, max_tokens: int = None, max_cost: float = None, downgrade_at: float = 0.8,
+                 prices: dict[str, float] = None, tenant_id: str = None, tenants: TenantBudgets = None):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.downgrade_at = downgrade_at
+        self.prices = prices or {}
+        self.tenant_id = tenant_id
+        self.tenants = tenants
+        self.tokens = 0
+        self.cost = 0.0
+        self.calls: list[dict] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _usage(response: LLMResult) -> tuple[int, Optional[str]]:
+        llm_output = response.llm_output or {}
+        model_name = llm_output.get("model_name")
+        tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    tokens += usage.get("total_tokens", 0)
+                    model_name = model_name or message.response_metadata.get("model_name")
+        if not tokens:
+            usage = llm_output.get("token_usage") or {}
+            tokens = usage.get("total_tokens", 0)
+        return tokens, model_name
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        tokens, model_name = self._usage(response)
+        cost = tokens / 1000 * self.prices.get(model_name, 0.0)
+        with self._lock:
+            self.tokens += tokens
+            self.cost += cost
+            self.calls.append({"model_name": model_name, "tokens": tokens, "cost": cost})
+        if self.tenants and self.tenant_id:
+            self.tenants.charge(self.tenant_id, tokens)
+
+    @property
+    def fraction_used(self) -> float:
+        fractions = [0.0]
+        if self.max_tokens:
+            fractions.append(self.tokens / self.max_tokens)
+        if self.max_cost:
+            fractions.append(self.cost / self.max_cost)
+        if self.tenants and self.tenant_id:
+            # Read at every check: other runs of the tenant spend from the same allowance.
+            remaining = self.tenants.remaining(self.tenant_id)
+            if remaining is not None:
+                fractions.append(self.tokens / (self.tokens + remaining) if remaining > 0 else 1.0)
+        return max(fractions)
+
+    @property
+    def should_downgrade(self) -> bool:
+        return self.fraction_used >= self.downgrade_at
+
+    @property
+    def exhausted(self) -> bool:
+        return self.fraction_used >= 1.0
+
+    def report(self) -> dict:
+        return {"tokens": self.tokens, "cost": round(self.cost, 6), "fraction_used": round(self.fraction_used, 3),
+                "calls": len(self.calls), "models": sorted({c["model_name"] for c in self.calls if c["model_name"]})}
+
+
+def _patched(config: RunnableConfig) -> RunnableConfig:
+    configurable = config.get("configurable", {}) if config else {}
+    budget: TokenBudget = configurable.get("token_budget_tracker")
+    if budget is None:
+        return config
+    if budget.exhausted:
+        raise BudgetExceeded(f"budget used up after {budget.tokens} tokens")
+    if budget.should_downgrade and configurable.get("downgrade_to"):
+        return {**config, "configurable": {**configurable, **configurable["downgrade_to"]}}
+    return config
+
+
+class BudgetAware(NodeWrapper):
+    """Runs `runnable` with the `downgrade_to` model near the budget, and not at all past it."""
+
+    def invoke(self, input, config: RunnableConfig = None, **kwargs):
+        return self.runnable.invoke(input, _patched(config), **kwargs)
+
+    async def ainvoke(self, input, config: RunnableConfig = None, **kwargs):
+        return await self.runnable.ainvoke(input, _patched(config), **kwargs)
+
+
+def budget_aware(node: Callable, name: str = None) -> Runnable:
+    """Wrap a node so it switches to `downgrade_to` near the budget and doesn't start past it."""
+    return BudgetAware(as_runnable(node), name)
+
+
+def _check_downgrade(configurable: dict) -> None:
+    from job_application import llm_factories, takes_model_name
+    downgrade_to = configurable.get("downgrade_to")
+    if not downgrade_to:
+        return
+    unknown = set(downgrade_to) - {"model_provider", "model_name"}
+    if unknown:
+        raise ValueError(f"downgrade_to only sets model_provider and model_name, got {sorted(unknown)}")
+    provider = downgrade_to.get("model_provider", configurable.get("model_provider", "OPEN_AI"))
+    if provider not in llm_factories:
+        raise ValueError(f"downgrade_to names an unknown model_provider {provider!r}")
+    if "model_name" in downgrade_to and not takes_model_name(provider):
+        raise ValueError(f"downgrade_to sets a model_name, but model_provider {provider!r} has a single model")
+
+
+def _start(config: RunnableConfig, tenants: TenantBudgets, prices: dict) -> tuple[TokenBudget, RunnableConfig]:
+    configurable = config.get("configurable", {})
+    _check_downgrade(configurable)
+    budget = TokenBudget(
+        max_tokens=configurable.get("token_budget"),
+        max_cost=configurable.get("cost_budget"),
+        downgrade_at=configurable.get("downgrade_at", 0.8),
+        prices=prices,
+        tenant_id=configurable.get("tenant_id"),
+        tenants=tenants,
+    )
+    if budget.exhausted:
+        raise BudgetExceeded(f"tenant {budget.tenant_id!r} has no budget left")
+    callbacks = list(config.get("callbacks") or []) + [budget]
+    return budget, {**config, "callbacks": callbacks,
+                    "configurable": {**configurable, "token_budget_tracker": budget}}
+
+
+def run_with_budget(graph, input: dict, config: RunnableConfig, tenants: TenantBudgets = None,
+                    prices: dict = None) -> tuple[dict, dict]:
+    """Run the graph under the budget in `config`; returns `(state, budget report)`.
+
+    If the budget runs out, the state is whatever the completed nodes produced and the
+    report has `"partial": True`.
+    """
+    budget, config = _start(config, tenants, prices)
+    state = dict(input)
+    try:
+        for state in graph.stream(input, config=config, stream_mode="values"):
+            pass
+        partial = False
+    except BudgetExceeded as e:
+        logger.warning(f"Stopping run: {e}")
+        partial = True
+    return state, {**budget.report(), "partial": partial}
+
+
+async def arun_with_budget(graph, input: dict, config: RunnableConfig, tenants: TenantBudgets = None,
+                           prices: dict = None) -> tuple[dict, dict]:
+    budget, config = _start(config, tenants, prices)
+    state = dict(input)
+    try:
+        async for state in graph.astream(input, config=config, stream_mode="values"):
+            pass
+        partial = False
+    except BudgetExceeded as e:
+        logger.warning(f"Stopping run: {e}")
+        partial = True
+    return state, {**budget.report(), "partial": partial}
+
+
+"""
+Let's put it on a graph that keeps revising the application with an LLM, which is
+exactly the kind of run that gets out of hand on a long job description.
+"""
+if __name__ == "__main__":
+    from langgraph.graph import StateGraph, START, END
+    from job_application import JobApplicationState, analyze_job_description, get_llm, llm_factories
+    from load_test_llm import LoadTestChatModel
+
+    lengths = {"big-model": 50, "small-model": 20}
+    llm_factories["load_test"] = lambda model_name="big-model": LoadTestChatModel(
+        responses=lambda messages: "YES" if "YES or NO" in messages[-1].content
+        else "Dear hiring manager " * lengths[model_name],
+        model_name=model_name)
+
+    def revise_application(state, config: RunnableConfig):
+        model_provider = config["configurable"].get("model_provider", "OPEN_AI")
+        model_name = config["configurable"].get("model_name")
+        prompt = f"Improve this application:\n{state.get('application', '')}\nJOB:\n{state['job_description']}"
+        draft = get_llm(model_provider, model_name).invoke(prompt).content
+        return {"application": draft, "actions": [f"revised with {model_name}"]}
+
+    def keep_revising(state):
+        return "revise_application" if len(state["actions"]) < 10 else END
+
+    builder = StateGraph(JobApplicationState)
+    builder.add_node("analyze_job_description", budget_aware(analyze_job_description))
+    builder.add_node("revise_application", budget_aware(revise_application))
+    builder.add_edge(START, "analyze_job_description")
+    builder.add_edge("analyze_job_description", "revise_application")
+    builder.add_conditional_edges("revise_application", keep_revising, ["revise_application", END])
+    graph = builder.compile()
+
+    tenants = TenantBudgets({"acme": 6_000}, default=100_000)
+    prices = {"big-model": 0.01, "small-model": 0.001}
+    config = {"configurable": {
+        "model_provider": "load_test", "model_name": "big-model", "token_budget": 2_500, "tenant_id": "acme",
+        "downgrade_at": 0.6, "downgrade_to": {"model_name": "small-model"},
+    }}
+    for run in range(4):
+        try:
+            state, report = run_with_budget(
+                graph, {"job_description": "Java developer " * 200}, config, tenants, prices)
+        except BudgetExceeded as e:
+            print(f"run {run}: rejected, {e}")
+            continue
+        print(f"run {run}: {report}")
+        print("   actions:", state["actions"])
+    print("tenant usage:", tenants.used)
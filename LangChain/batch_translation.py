@@ -0,0 +1,201 @@
+"""Batch translation
+The English to French `ChatPromptTemplate` in prompts.py translates one string per call.
+For a large catalog that means one request (and one copy of the system prompt) per string.
+
+`BatchTranslator` packs many segments into one prompt, each wrapped in a numbered tag,
+up to a token budget, and splits the answer back per segment. Segments that come back
+missing or mangled are retried on their own with the original one-string template.
+Packed requests run concurrently under a limit, and results stream out in input order.
+"""
+
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, AsyncIterator
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+
+logger = logging.getLogger(__name__)
+
+single_template = ChatPromptTemplate.from_messages([
+    ("system", "You are an English to French translator."),
+    ("user", "Translate this to French: {text}")
+])
+
+batch_template = ChatPromptTemplate.from_messages([
+    ("system", "You are an English to French translator."),
+    ("user",
+     "Translate each segment below to French. Every segment is wrapped in <s id=\"N\">...</s>. "
+     "Answer with exactly the same tags and ids, one translated segment per tag, and nothing else.\n\n"
+     "{segments}")
+])
+
+SEGMENT_PATTERN = re.compile(r'<s id="(\d+)">(.*?)</s>', re.DOTALL)
+
+
+def approximate_tokens(text: str) -> int:
+    # Roughly four characters per token for English; good enough for packing.
+    return len(text) // 4 + 1
+
+
+class BatchTranslator(Runnable):
+    """Translate a list of strings with as few LLM requests as the budget allows.
+
+    `max_tokens_per_request` bounds the segment text of one packed prompt (the answer
+    is about as long, so keep it under half the model's context). `count_tokens` can be
+    swapped for a real tokenizer, e.g. `llm.get_num_tokens`.
+    """
+
+    def __init__(
+        self,
+        llm,
+        max_tokens_per_request: int = 2000,
+        max_segments_per_request: int = 50,
+        max_concurrency: int = 4,
+        count_tokens: Callable[[str], int] = approximate_tokens,
+    ):
+        self.llm = llm
+        self.max_tokens_per_request = max_tokens_per_request
+        self.max_segments_per_request = max_segments_per_request
+        self.max_concurrency = max_concurrency
+        self.count_tokens = count_tokens
+
+    def pack(self, segments: list[str]) -> list[list[int]]:
+        """Group segment indices into consecutive packs that fit the budget."""
+        packs, current, used = [], [], 0
+        for i, segment in enumerate(segments):
+            cost = self.count_tokens(segment) + 8  # tag overhead
+            if current and (used + cost > self.max_tokens_per_request
+                            or len(current) >= self.max_segments_per_request):
+                packs.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += cost
+        if current:
+            packs.append(current)
+        return packs
+
+    def _batch_messages(self, segments: list[str], pack: list[int]):
+        tagged = "\n".join(f'<s id="{n}">{segments[i]}</s>' for n, i in enumerate(pack))
+        return batch_template.format_messages(segments=tagged)
+
+    @staticmethod
+    def _split(content: str, pack: list[int]) -> dict[int, str]:
+        found = {}
+        for n, text in SEGMENT_PATTERN.findall(content):
+            n = int(n)
+            if n < len(pack) and n not in found and text.strip():
+                found[n] = text.strip()
+        return {pack[n]: text for n, text in found.items()}
+
+    def _translate_pack(self, segments: list[str], pack: list[int], config=None) -> dict[int, str]:
+        if len(pack) == 1:
+            return self._translate_one(segments, pack[0], config)
+        result = self._split(self.llm.invoke(self._batch_messages(segments, pack), config).content, pack)
+        missing = [i for i in pack if i not in result]
+        if missing:
+            logger.info(f"{len(missing)} of {len(pack)} segments misaligned, retrying them one by one")
+        for i in missing:
+            result.update(self._translate_one(segments, i, config))
+        return result
+
+    def _translate_one(self, segments: list[str], i: int, config=None) -> dict[int, str]:
+        message = self.llm.invoke(single_template.format_messages(text=segments[i]), config)
+        return {i: message.content.strip()}
+
+    async def _atranslate_pack(self, segments: list[str], pack: list[int], config=None) -> dict[int, str]:
+        if len(pack) == 1:
+            return await self._atranslate_one(segments, pack[0], config)
+        message = await self.llm.ainvoke(self._batch_messages(segments, pack), config)
+        result = self._split(message.content, pack)
+        missing = [i for i in pack if i not in result]
+        if missing:
+            logger.info(f"{len(missing)} of {len(pack)} segments misaligned, retrying them one by one")
+            for retried in await asyncio.gather(*(self._atranslate_one(segments, i, config) for i in missing)):
+                result.update(retried)
+        return result
+
+    async def _atranslate_one(self, segments: list[str], i: int, config=None) -> dict[int, str]:
+        message = await self.llm.ainvoke(single_template.format_messages(text=segments[i]), config)
+        return {i: message.content.strip()}
+
+    def stream(self, input: list[str], config=None, **kwargs) -> Iterator[str]:
+        """Yield translations in input order, each as soon as everything before it is done."""
+        done, next_index = {}, 0
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            futures = [pool.submit(self._translate_pack, input, pack, config) for pack in self.pack(input)]
+            for future in as_completed(futures):
+                done.update(future.result())
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
+        finally:
+            # If the consumer stops early or a pack fails, packs not started yet never run.
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def astream(self, input: list[str], config=None, **kwargs) -> AsyncIterator[str]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(pack):
+            async with semaphore:
+                return await self._atranslate_pack(input, pack, config)
+
+        done, next_index = {}, 0
+        tasks = [asyncio.ensure_future(run(pack)) for pack in self.pack(input)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                done.update(await finished)
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def invoke(self, input: list[str], config=None, **kwargs) -> list[str]:
+        return list(self.stream(input, config))
+
+    async def ainvoke(self, input: list[str], config=None, **kwargs) -> list[str]:
+        return [translation async for translation in self.astream(input, config)]
+
+
+"""
+Let's try it with a fake translator that answers in the tagged format, but now and
+then drops a segment, so we can see the individual retries.
+"""
+if __name__ == "__main__":
+    import random
+    import time
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+
+    calls = {"batch": 0, "single": 0}
+
+    def fake_translate(messages):
+        time.sleep(0.05)
+        prompt = messages[-1].content
+        tagged = SEGMENT_PATTERN.findall(prompt)
+        if not tagged:
+            calls["single"] += 1
+            return AIMessage(content="[fr] " + prompt.removeprefix("Translate this to French: "))
+        calls["batch"] += 1
+        kept = [(n, text) for n, text in tagged if random.random() > 0.03]
+        return AIMessage(content="\n".join(f'<s id="{n}">[fr] {text}</s>' for n, text in kept))
+
+    llm = RunnableLambda(fake_translate)
+    catalog = [f"Product {i}: a sturdy laptop carrying case in size {i % 5 + 13} inches." for i in range(500)]
+
+    translator = BatchTranslator(llm, max_tokens_per_request=600, max_concurrency=8)
+    start = time.perf_counter()
+    translations = translator.invoke(catalog)
+    print(f"{len(translations)} segments in {time.perf_counter() - start:.2f}s, requests: {calls}")
+    print(translations[:3])
+
+    async def main():
+        async for translation in translator.astream(catalog[:5]):
+            print(translation)
+
+    asyncio.run(main())
@@ -0,0 +1,255 @@
+"""Record and replay LLM calls
+Every module here talks to a live `ChatOpenAI` at `OPEN_AI_LITE_LLM_BASE_URL`, so
+benchmark numbers for a chain move with the network and the provider's load, and nothing
+runs offline.
+
+`CassetteChatModel` wraps a chat model. In "record" mode it passes calls through and
+stores each exchange (answer, token usage, latency and, for streams, the timing of every
+chunk) in a gzipped JSON cassette. In "replay" mode it answers from the cassette without
+the real model, sleeping for the recorded latency times `latency_scale`, so a chain or a
+graph can be benchmarked repeatably with no network. Requests are matched by their
+normalized prompt: roles plus contents with whitespace collapsed. Each prompt keeps one
+recording, so replay gives the same answers in any order and under any concurrency; a
+second recording of a prompt with a different answer is logged and dropped.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class CassetteMiss(KeyError):
+    pass
+
+
+def normalize_prompt(messages: list[BaseMessage], namespace: str = "", stop: Optional[list[str]] = None) -> str:
+    parts = [namespace, json.dumps(stop or [])]
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content, sort_keys=True)
+        parts.append(f"{message.type}: {WHITESPACE.sub(' ', content).strip()}")
+    return "\n".join(parts)
+
+
+def prompt_key(messages: list[BaseMessage], namespace: str = "", stop: Optional[list[str]] = None) -> str:
+    return hashlib.sha256(normalize_prompt(messages, namespace, stop).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """One recorded exchange per prompt key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def add(self, key: str, entry: dict) -> None:
+        with self._lock:
+            recorded = self.entries.setdefault(key, entry)
+        if recorded is not entry and recorded["content"] != entry["content"]:
+            logger.warning(f"Conflicting recordings for prompt {key[:12]}, keeping the first one")
+
+    def next(self, key: str) -> dict:
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            raise CassetteMiss(key)
+        return entry
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self.entries, separators=(",", ":"))
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class CassetteChatModel(BaseChatModel):
+    """Chat model that records exchanges of `llm` into `cassette`, or replays them.
+
+    `mode` is "record", "replay", or "auto" (replay what's recorded, record the rest).
+    In replay mode `llm` may be None; a prompt that isn't in the cassette raises `CassetteMiss`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    cassette: Cassette
+    llm: Optional[BaseChatModel] = None
+    mode: str = "auto"
+    latency_scale: float = 1.0
+    namespace: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        if self.mode == "record":
+            return None
+        try:
+            return self.cassette.next(key)
+        except CassetteMiss:
+            if self.mode == "replay" or self.llm is None:
+                raise
+            return None
+
+    @staticmethod
+    def _entry(message: BaseMessage, latency: float, chunks: list = None) -> dict:
+        entry = {
+            "content": message.content,
+            "usage": message.usage_metadata,
+            "metadata": {k: v for k, v in message.response_metadata.items() if k in ("model_name", "finish_reason")},
+            "latency": round(latency, 6),
+        }
+        if chunks is not None:
+            entry["chunks"] = chunks
+        return entry
+
+    @staticmethod
+    def _message(entry: dict) -> AIMessage:
+        return AIMessage(content=entry["content"], usage_metadata=entry.get("usage"),
+                         response_metadata={**entry.get("metadata", {}), "replayed": True})
+
+    def _replay_chunks(self, entry: dict) -> list:
+        # [seconds since start, text] pairs; a non-streamed recording replays as one chunk.
+        return entry.get("chunks") or [[entry["latency"], entry["content"]]]
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        key = prompt_key(messages, self.namespace, stop)
+        entry = self._lookup(key)
+        if entry is not None:
+            time.sleep(entry["latency"] * self.latency_scale)
+            return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+        start = time.perf_counter()
+        message = self.llm.invoke(messages, stop=stop, **kwargs)
+        self.cassette.add(key, self._entry(message, time.perf_counter() - start))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        key = prompt_key(messages, self.namespace, stop)
+        entry = self._lookup(key)
+        if entry is not None:
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+            return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+        start = time.perf_counter()
+        message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+        self.cassette.add(key, self._entry(message, time.perf_counter() - start))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        key = prompt_key(messages, self.namespace, stop)
+        entry = self._lookup(key)
+        if entry is not None:
+            start = time.perf_counter()
+            for offset, text in self._replay_chunks(entry):
+                delay = offset * self.latency_scale - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=entry.get("usage")))
+            return
+        start = time.perf_counter()
+        chunks, message = [], None
+        for chunk in self.llm.stream(messages, stop=stop, **kwargs):
+            chunks.append([round(time.perf_counter() - start, 6), chunk.content])
+            message = chunk if message is None else message + chunk
+            yield ChatGenerationChunk(message=chunk)
+        if message is not None:
+            self.cassette.add(key, self._entry(message, time.perf_counter() - start, chunks))
+
+    async def _astream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        key = prompt_key(messages, self.namespace, stop)
+        entry = self._lookup(key)
+        if entry is not None:
+            start = time.perf_counter()
+            for offset, text in self._replay_chunks(entry):
+                delay = offset * self.latency_scale - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=entry.get("usage")))
+            return
+        start = time.perf_counter()
+        chunks, message = [], None
+        async for chunk in self.llm.astream(messages, stop=stop, **kwargs):
+            chunks.append([round(time.perf_counter() - start, 6), chunk.content])
+            message = chunk if message is None else message + chunk
+            yield ChatGenerationChunk(message=chunk)
+        if message is not None:
+            self.cassette.add(key, self._entry(message, time.perf_counter() - start, chunks))
+
+
+"""
+Let's record the story -> mood chain from LCEL.py once against a slow fake model
+standing in for `openai_llm`, then replay it at the original speed and instantly.
+"""
+if __name__ == "__main__":
+    import tempfile
+    from langchain_core.language_models import SimpleChatModel
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    def build_chain(llm):
+        story_chain = PromptTemplate.from_template("Write a short story about {topic}") | llm | StrOutputParser()
+        analysis_prompt = PromptTemplate.from_template("Analyze the following story's mood:\n{story}")
+        analysis_chain = analysis_prompt | llm | StrOutputParser()
+        return story_chain | analysis_chain
+
+    topics = [{"topic": t} for t in ("a rainy day", "a lost cat", "a job interview", "a rainy day")]
+    path = os.path.join(tempfile.mkdtemp(), "story_with_analysis.json.gz")
+
+    class SlowFakeChatModel(SimpleChatModel):
+        sleep: float = 0.2
+
+        @property
+        def _llm_type(self) -> str:
+            return "slow-fake"
+
+        def _call(self, messages, *args, **kwargs):
+            time.sleep(self.sleep)
+            prompt = messages[-1].content
+            if prompt.startswith("Write"):
+                return f"Once upon a time, {prompt[28:]}..."
+            return f"The mood of '{prompt.splitlines()[-1]}' is calm."
+
+    recorder = CassetteChatModel(cassette=Cassette(path), llm=SlowFakeChatModel(), mode="record")
+    start = time.perf_counter()
+    recorded = build_chain(recorder).batch(topics)
+    print(f"recorded {len(recorder.cassette)} prompts in {time.perf_counter() - start:.2f}s")
+    recorder.cassette.save()
+    print(f"cassette: {os.path.getsize(path)} bytes")
+
+    for scale in (1.0, 0.0):
+        replayer = CassetteChatModel(cassette=Cassette(path), mode="replay", latency_scale=scale)
+        start = time.perf_counter()
+        replayed = build_chain(replayer).batch(topics)
+        assert replayed == recorded, (replayed, recorded)
+        print(f"replay at latency x{scale}: {time.perf_counter() - start:.3f}s, same answers: {replayed == recorded}")
@@ -0,0 +1,314 @@
+"""Routing across several Ollama servers
+`ChatOllama(model="deepseek-r1:1.5b")` in local_models.py talks to a single local server.
+When we have a small fleet of CPU boxes, we want one logical model over all of them:
+each request goes to the endpoint with the fewest outstanding requests and the best
+observed latency, the model is kept loaded on every box, and endpoints that fail are
+taken out of rotation for a while.
+"""
+
+import logging
+import threading
+import time
+
+import requests
+from langchain_core.runnables import Runnable
+from langchain_ollama import ChatOllama
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaEndpoint:
+    """One Ollama-compatible server plus the bookkeeping the router needs."""
+
+    def __init__(self, base_url: str, chat: ChatOllama):
+        self.base_url = base_url.rstrip("/")
+        self.chat = chat
+        self.inflight = 0
+        self.latency_ewma = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def score(self, default_latency: float) -> float:
+        # Expected wait if we queue behind everything already in flight here.
+        latency = self.latency_ewma if self.latency_ewma is not None else default_latency
+        return (self.inflight + 1) * latency
+
+    def __repr__(self):
+        return f"OllamaEndpoint({self.base_url!r}, inflight={self.inflight}, latency_ewma={self.latency_ewma})"
+
+
+class OllamaRouter(Runnable):
+    """A chat runnable that spreads requests across several Ollama endpoints.
+
+    Endpoints are picked by `(inflight + 1) * latency_ewma`, so a fast box takes more
+    traffic and a busy one less. A failed endpoint is put on a cooldown that doubles
+    with every consecutive failure, and the request is retried on the next best one.
+    """
+
+    def __init__(
+        self,
+        base_urls: list[str],
+        model: str,
+        keep_alive: str = "30m",
+        ewma_alpha: float = 0.3,
+        cooldown: float = 10.0,
+        max_cooldown: float = 300.0,
+        max_attempts: int = None,
+        request_timeout: float = 5.0,
+        **chat_kwargs,
+    ):
+        if not base_urls:
+            raise ValueError("OllamaRouter needs at least one endpoint")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.ewma_alpha = ewma_alpha
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_attempts = max_attempts or len(base_urls)
+        self.request_timeout = request_timeout
+        self.endpoints = [
+            OllamaEndpoint(
+                url,
+                ChatOllama(model=model, base_url=url, keep_alive=keep_alive, **chat_kwargs),
+            )
+            for url in base_urls
+        ]
+        self._lock = threading.Lock()
+        self._keep_alive_stop = threading.Event()
+        self._keep_alive_thread = None
+
+    def _acquire(self, exclude: set) -> OllamaEndpoint:
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in exclude and e.is_available(now)]
+            if not candidates:
+                # Everything is cooling down: try the one that comes back first
+                # rather than failing outright.
+                candidates = sorted(
+                    (e for e in self.endpoints if e not in exclude), key=lambda e: e.down_until
+                )[:1]
+            if not candidates:
+                raise RuntimeError("No Ollama endpoint left to try")
+            known = [e.latency_ewma for e in candidates if e.latency_ewma is not None]
+            default_latency = min(known) if known else 1.0
+            endpoint = min(candidates, key=lambda e: e.score(default_latency))
+            endpoint.inflight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: OllamaEndpoint, elapsed: float = None, error: Exception = None):
+        with self._lock:
+            endpoint.inflight -= 1
+            if error is None:
+                if elapsed is None:
+                    return
+                endpoint.consecutive_failures = 0
+                if endpoint.latency_ewma is None:
+                    endpoint.latency_ewma = elapsed
+                else:
+                    endpoint.latency_ewma += self.ewma_alpha * (elapsed - endpoint.latency_ewma)
+                return
+        self._mark_failed(endpoint, error)
+
+    def _mark_failed(self, endpoint: OllamaEndpoint, error: Exception):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            backoff = min(self.cooldown * 2 ** (endpoint.consecutive_failures - 1), self.max_cooldown)
+            endpoint.down_until = time.monotonic() + backoff
+        logger.warning(f"Endpoint {endpoint.base_url} failed ({error}), out of rotation for {backoff:.1f}s")
+
+    def invoke(self, input, config=None, **kwargs):
+        tried = set()
+        last_error = None
+        for _ in range(self.max_attempts):
+            endpoint = self._acquire(tried)
+            tried.add(endpoint)
+            start = time.perf_counter()
+            try:
+                result = endpoint.chat.invoke(input, config, **kwargs)
+            except Exception as e:
+                self._release(endpoint, error=e)
+                last_error = e
+                continue
+            self._release(endpoint, elapsed=time.perf_counter() - start)
+            return result
+        raise RuntimeError(f"All {len(tried)} Ollama endpoints failed") from last_error
+
+    def stream(self, input, config=None, **kwargs):
+        # Only fail over before the first chunk: once tokens went out we can't replay them.
+        tried = set()
+        last_error = None
+        for _ in range(self.max_attempts):
+            endpoint = self._acquire(tried)
+            tried.add(endpoint)
+            start = time.perf_counter()
+            started = completed = False
+            error = None
+            try:
+                for chunk in endpoint.chat.stream(input, config, **kwargs):
+                    started = True
+                    yield chunk
+                completed = True
+            except Exception as e:
+                error = e
+                if started:
+                    raise
+                last_error = e
+            finally:
+                # Also runs on GeneratorExit when the consumer stops early; a partial
+                # stream says nothing about the endpoint's latency.
+                if error is not None:
+                    self._release(endpoint, error=error)
+                else:
+                    self._release(endpoint, elapsed=time.perf_counter() - start if completed else None)
+            if completed:
+                return
+        raise RuntimeError(f"All {len(tried)} Ollama endpoints failed") from last_error
+
+    def preload(self) -> dict:
+        """Load the model on every endpoint and pin it for `keep_alive`.
+
+        An /api/generate call without a prompt only loads the model, see the Ollama FAQ.
+        Endpoints that don't answer are taken out of rotation.
+        """
+        status = {}
+        for endpoint in self.endpoints:
+            try:
+                response = requests.post(
+                    f"{endpoint.base_url}/api/generate",
+                    json={"model": self.model, "keep_alive": self.keep_alive},
+                    timeout=self.request_timeout,
+                )
+                response.raise_for_status()
+                status[endpoint.base_url] = True
+                if endpoint.consecutive_failures:
+                    with self._lock:
+                        endpoint.consecutive_failures = 0
+                        endpoint.down_until = 0.0
+            except Exception as e:
+                self._mark_failed(endpoint, e)
+                status[endpoint.base_url] = False
+        return status
+
+    def start_keep_alive(self, interval: float = 60.0):
+        """Re-send the preload request every `interval` seconds in a daemon thread.
+
+        Besides keeping the model resident, this also brings recovered endpoints back
+        into rotation without waiting for real traffic to probe them.
+        """
+        if self._keep_alive_thread is not None:
+            return
+
+        def loop():
+            while not self._keep_alive_stop.wait(interval):
+                self.preload()
+
+        self.preload()
+        self._keep_alive_stop.clear()
+        self._keep_alive_thread = threading.Thread(target=loop, name="ollama-keep-alive", daemon=True)
+        self._keep_alive_thread.start()
+
+    def stop_keep_alive(self):
+        self._keep_alive_stop.set()
+        if self._keep_alive_thread is not None:
+            self._keep_alive_thread.join()
+            self._keep_alive_thread = None
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "base_url": e.base_url,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "inflight": e.inflight,
+                    "latency_ewma": e.latency_ewma,
+                    "available": e.is_available(now),
+                }
+                for e in self.endpoints
+            ]
+
+
+"""
+Local stand-in servers
+To try the router without a fleet, we can start a few tiny HTTP servers that speak
+just enough of the Ollama API (/api/chat, /api/generate, /api/tags), each with its own
+latency, and one that always fails.
+"""
+import json
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def start_fake_ollama_server(name: str, latency: float = 0.0, fail: bool = False):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: bytes, content_type: str = "application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._reply(200, json.dumps({"models": [{"name": name}]}).encode())
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if fail:
+                return self._reply(500, b'{"error": "model crashed"}')
+            time.sleep(latency)
+            created_at = datetime.now(timezone.utc).isoformat()
+            if self.path == "/api/generate":
+                body = {"model": request.get("model"), "created_at": created_at, "response": "", "done": True}
+                return self._reply(200, json.dumps(body).encode())
+            chunks = [
+                {"model": request.get("model"), "created_at": created_at,
+                 "message": {"role": "assistant", "content": f"answer from {name}"}, "done": False},
+                {"model": request.get("model"), "created_at": created_at,
+                 "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop",
+                 "prompt_eval_count": 10, "eval_count": 3},
+            ]
+            body = "".join(json.dumps(c) + "\n" for c in chunks).encode()
+            self._reply(200, body, "application/x-ndjson")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    servers = [
+        start_fake_ollama_server("fast-box", latency=0.02),
+        start_fake_ollama_server("slow-box", latency=0.2),
+        start_fake_ollama_server("broken-box", fail=True),
+    ]
+
+    router = OllamaRouter([url for _, url in servers], model="deepseek-r1:1.5b", temperature=0)
+    print(router.preload())
+
+    messages = [
+        ("system", "You are a helpful assistant."),
+        ("human", "What makes LangChain great for working with LLMs?"),
+    ]
+    print(router.invoke(messages).content)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(lambda _: router.invoke(messages).content, range(40)))
+    print({a: answers.count(a) for a in set(answers)})
+    for row in router.stats():
+        print(row)
+
+    for server, _ in servers:
+        server.shutdown()
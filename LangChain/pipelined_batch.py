@@ -0,0 +1,214 @@
+"""Pipelined batches for multi-LLM chains
+`story_with_analysis = story_chain | analysis_chain` in LCEL.py batches step by step:
+`.batch()` writes every story before the first analysis starts, so a batch takes the
+time of all story waves plus all analysis waves, and nothing comes out until the end.
+
+`PipelinedSequence` runs the stages of a chain as a pipeline: each stage has its own
+concurrency limit, an item moves on to the next stage as soon as its previous stage is
+done, and results are yielded as items complete. End-to-end time approaches the time
+of the slowest stage plus the latency of the others for one item. `split_at_models`
+cuts an existing `RunnableSequence` into one stage per model call.
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable, RunnableSequence
+from langchain_core.runnables.config import RunnableConfig
+
+
+def split_at_models(chain: Runnable) -> list[Runnable]:
+    """One stage per model: a new stage starts at the prompt (or model) after a model."""
+    steps = chain.steps if isinstance(chain, RunnableSequence) else [chain]
+    stages, current, has_model = [], [], False
+    for step in steps:
+        if has_model and isinstance(step, (BasePromptTemplate, BaseLanguageModel)):
+            stages.append(current)
+            current, has_model = [], False
+        current.append(step)
+        has_model = has_model or isinstance(step, BaseLanguageModel)
+    stages.append(current)
+    return [stage[0] if len(stage) == 1 else RunnableSequence(*stage) for stage in stages]
+
+
+class PipelinedSequence(Runnable):
+
+    def __init__(self, stages: list[Runnable], concurrency: int | list[int] = 4):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.concurrency = [concurrency] * len(stages) if isinstance(concurrency, int) else list(concurrency)
+        if len(self.concurrency) != len(stages):
+            raise ValueError("Give one concurrency limit per stage")
+
+    @classmethod
+    def from_chain(cls, chain: Runnable, concurrency: int | list[int] = 4) -> "PipelinedSequence":
+        return cls(split_at_models(chain), concurrency)
+
+    def invoke(self, input, config: RunnableConfig = None, **kwargs):
+        for stage in self.stages:
+            input = stage.invoke(input, config)
+        return input
+
+    async def ainvoke(self, input, config: RunnableConfig = None, **kwargs):
+        for stage in self.stages:
+            input = await stage.ainvoke(input, config)
+        return input
+
+    def stream_batch(self, inputs: list, config: RunnableConfig = None,
+                     return_exceptions: bool = False) -> Iterator[tuple[int, Any]]:
+        """Yield `(index, output)` as items leave the last stage.
+
+        Each stage has its own thread pool sized to its concurrency limit. A failed item
+        skips the remaining stages and comes out as its exception.
+        """
+        done: queue.Queue = queue.Queue()
+        pools = [ThreadPoolExecutor(max_workers=n) for n in self.concurrency]
+        cancelled = threading.Event()
+
+        def submit(stage_index: int, index: int, value):
+            if cancelled.is_set():
+                return
+            try:
+                future = pools[stage_index].submit(self.stages[stage_index].invoke, value, config)
+            except RuntimeError:
+                if cancelled.is_set():
+                    # The consumer stopped early and the pools are shut down.
+                    return
+                raise
+            future.add_done_callback(lambda f: advance(stage_index, index, f))
+
+        def advance(stage_index: int, index: int, future):
+            # Entries are (index, ok, value): an output may itself be an exception object.
+            error = future.exception()
+            if error is not None:
+                done.put((index, False, error))
+            elif stage_index + 1 < len(self.stages):
+                try:
+                    submit(stage_index + 1, index, future.result())
+                except Exception as e:
+                    # Raised in a done callback it would only be logged, and the item lost.
+                    done.put((index, False, e))
+            else:
+                done.put((index, True, future.result()))
+
+        try:
+            for index, value in enumerate(inputs):
+                submit(0, index, value)
+            for _ in range(len(inputs)):
+                index, ok, output = done.get()
+                if not ok and not return_exceptions:
+                    raise output
+                yield index, output
+        finally:
+            cancelled.set()
+            for pool in pools:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def batch(self, inputs: list, config: RunnableConfig | list[RunnableConfig] = None, *,
+              return_exceptions: bool = False, **kwargs: Optional[Any]) -> list:
+        if isinstance(config, list):
+            config = config[0] if config else None
+        outputs = [None] * len(inputs)
+        for index, output in self.stream_batch(inputs, config, return_exceptions):
+            outputs[index] = output
+        return outputs
+
+    async def astream_batch(self, inputs: list, config: RunnableConfig = None,
+                            return_exceptions: bool = False) -> AsyncIterator[tuple[int, Any]]:
+        semaphores = [asyncio.Semaphore(n) for n in self.concurrency]
+
+        async def run(index: int, value):
+            try:
+                for stage, semaphore in zip(self.stages, semaphores):
+                    async with semaphore:
+                        value = await stage.ainvoke(value, config)
+                return index, True, value
+            except Exception as e:
+                return index, False, e
+
+        tasks = [asyncio.ensure_future(run(index, value)) for index, value in enumerate(inputs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, ok, output = await next_done
+                if not ok and not return_exceptions:
+                    raise output
+                yield index, output
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def abatch(self, inputs: list, config: RunnableConfig | list[RunnableConfig] = None, *,
+                     return_exceptions: bool = False, **kwargs: Optional[Any]) -> list:
+        if isinstance(config, list):
+            config = config[0] if config else None
+        outputs = [None] * len(inputs)
+        async for index, output in self.astream_batch(inputs, config, return_exceptions):
+            outputs[index] = output
+        return outputs
+
+
+"""
+Example: story_with_analysis from LCEL.py over 20 topics, with a fake model that takes
+0.3s to write a story and 0.2s to analyze one.
+"""
+if __name__ == "__main__":
+    import time
+    from langchain_core.language_models import SimpleChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    class TimedFakeModel(SimpleChatModel):
+        @property
+        def _llm_type(self) -> str:
+            return "timed-fake"
+
+        @staticmethod
+        def _reply(prompt: str) -> tuple[float, str]:
+            if prompt.startswith("Write"):
+                return 0.3, f"A story: {prompt[28:]}"
+            return 0.2, f"The mood of '{prompt.splitlines()[-1]}' is calm."
+
+        def _call(self, messages, *args, **kwargs):
+            delay, text = self._reply(messages[-1].content)
+            time.sleep(delay)
+            return text
+
+        async def _agenerate(self, messages, *args, **kwargs):
+            delay, text = self._reply(messages[-1].content)
+            await asyncio.sleep(delay)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    openai_llm = TimedFakeModel()
+    story_prompt = PromptTemplate.from_template("Write a short story about {topic}")
+    story_chain = story_prompt | openai_llm | StrOutputParser()
+    analysis_prompt = PromptTemplate.from_template("Analyze the following story's mood:\n{story}")
+    analysis_chain = analysis_prompt | openai_llm | StrOutputParser()
+    story_with_analysis = story_chain | analysis_chain
+
+    topics = [{"topic": f"topic {i}"} for i in range(20)]
+
+    start = time.perf_counter()
+    expected = story_with_analysis.batch(topics, {"max_concurrency": 4})
+    print(f"RunnableSequence.batch: {time.perf_counter() - start:.2f}s, first result at the end")
+
+    pipeline = PipelinedSequence.from_chain(story_with_analysis, concurrency=[4, 4])
+    print(f"stages: {len(pipeline.stages)}")
+    start = time.perf_counter()
+    first, outputs = None, [None] * len(topics)
+    for index, output in pipeline.stream_batch(topics):
+        first = first or time.perf_counter() - start
+        outputs[index] = output
+    print(f"PipelinedSequence.stream_batch: {time.perf_counter() - start:.2f}s, first result at {first:.2f}s, "
+          f"same outputs: {outputs == expected}")
+
+    start = time.perf_counter()
+    outputs = asyncio.run(pipeline.abatch(topics))
+    print(f"PipelinedSequence.abatch: {time.perf_counter() - start:.2f}s, same outputs: {outputs == expected}")
@@ -0,0 +1,189 @@
+"""Keyframes for video understanding
+The video path sketched in multimodal.py sends the whole video to the model, so a long
+clip means a large upload and a large token bill for mostly repeated frames.
+
+Here the video is decoded as a stream of frames at a low sampling rate (OpenCV when it's
+installed, otherwise an `ffmpeg` subprocess writing raw RGB to a pipe), and only frames
+whose colour histogram differs enough from the last keyframe (a scene change) are kept,
+at most `budget` of them: when there are more candidates the weakest changes are dropped.
+Keyframes are downsized and JPEG-encoded, and go to the model as one multi-image message
+in the same format `analyze_image` uses.
+"""
+
+import base64
+import heapq
+import io
+import json
+import shutil
+import subprocess
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+import numpy as np
+from PIL import Image
+from langchain_core.messages import HumanMessage
+
+
+@dataclass(order=True)
+class Keyframe:
+    score: float
+    timestamp: float
+    image: Image.Image = field(compare=False)
+
+
+def iter_frames_opencv(path: str, sample_fps: float) -> Iterator[tuple[float, np.ndarray]]:
+    import cv2
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, round(fps / sample_fps))
+    i = 0
+    try:
+        while capture.grab():
+            if i % step == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield i / fps, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            i += 1
+    finally:
+        capture.release()
+
+
+def iter_frames_ffmpeg(path: str, sample_fps: float) -> Iterator[tuple[float, np.ndarray]]:
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height",
+         "-of", "json", path], capture_output=True, check=True)
+    stream = json.loads(probe.stdout)["streams"][0]
+    width, height = stream["width"], stream["height"]
+    process = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", path, "-vf", f"fps={sample_fps}", "-f", "rawvideo", "-pix_fmt", "rgb24", "-"],
+        stdout=subprocess.PIPE)
+    frame_size = width * height * 3
+    i = 0
+    try:
+        while True:
+            data = process.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break
+            yield i / sample_fps, np.frombuffer(data, np.uint8).reshape(height, width, 3)
+            i += 1
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+def iter_frames(path: str, sample_fps: float = 2.0) -> Iterator[tuple[float, np.ndarray]]:
+    """`(timestamp, RGB frame)` pairs, `sample_fps` per second of video."""
+    try:
+        import cv2  # noqa: F401
+        return iter_frames_opencv(path, sample_fps)
+    except ImportError:
+        pass
+    if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+        return iter_frames_ffmpeg(path, sample_fps)
+    raise RuntimeError("Decoding video needs opencv-python or ffmpeg on the PATH")
+
+
+def color_histogram(frame: np.ndarray, bins: int = 8, stride: int = 4) -> np.ndarray:
+    """Normalized joint RGB histogram of every `stride`-th pixel."""
+    pixels = frame[::stride, ::stride].reshape(-1, 3).astype(np.uint16) * bins // 256
+    index = (pixels[:, 0] * bins + pixels[:, 1]) * bins + pixels[:, 2]
+    histogram = np.bincount(index, minlength=bins ** 3).astype(np.float32)
+    return histogram / histogram.sum()
+
+
+def histogram_distance(a: np.ndarray, b: np.ndarray) -> float:
+    # 1 - histogram intersection: 0 for identical colour distributions, 1 for disjoint ones.
+    return float(1.0 - np.minimum(a, b).sum())
+
+
+def downsize(frame: np.ndarray, max_side: int = 512) -> Image.Image:
+    image = Image.fromarray(frame)
+    image.thumbnail((max_side, max_side))
+    return image
+
+
+def select_keyframes(frames: Iterable[tuple[float, np.ndarray]], budget: int = 8, threshold: float = 0.3,
+                     min_gap: float = 1.0, max_side: int = 512) -> list[Keyframe]:
+    """Pick up to `budget` scene-change frames, in time order; the first frame is always kept.
+
+    Only the downsized candidates are held in memory, never the decoded video.
+    """
+    first, candidates = None, []
+    reference, last_time = None, None
+    for timestamp, frame in frames:
+        histogram = color_histogram(frame)
+        if reference is None:
+            first = Keyframe(1.0, timestamp, downsize(frame, max_side))
+            reference, last_time = histogram, timestamp
+            continue
+        score = histogram_distance(reference, histogram)
+        if score < threshold or timestamp - last_time < min_gap:
+            continue
+        reference, last_time = histogram, timestamp
+        keyframe = Keyframe(score, timestamp, downsize(frame, max_side))
+        # Min-heap on score: once over budget, the weakest scene change goes.
+        if len(candidates) < budget - 1:
+            heapq.heappush(candidates, keyframe)
+        elif candidates and score > candidates[0].score:
+            heapq.heapreplace(candidates, keyframe)
+    if first is None:
+        return []
+    return sorted([first, *candidates][:budget], key=lambda k: k.timestamp)
+
+
+def encode_jpeg(image: Image.Image, quality: int = 80) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def keyframes_message(keyframes: list[Keyframe], question: str, detail: str = "low",
+                      quality: int = 80) -> HumanMessage:
+    content = [{"type": "text", "text": f"{question}\nThese are keyframes of a video, in order."}]
+    for keyframe in keyframes:
+        content.append({"type": "text", "text": f"t={keyframe.timestamp:.1f}s"})
+        content.append({"type": "image_url", "image_url": {
+            "url": f"data:image/jpeg;base64,{encode_jpeg(keyframe.image, quality)}", "detail": detail}})
+    return HumanMessage(content=content)
+
+
+def analyze_video(llm, path: str, question: str, budget: int = 8, sample_fps: float = 2.0,
+                  threshold: float = 0.3, max_side: int = 512) -> str:
+    keyframes = select_keyframes(iter_frames(path, sample_fps), budget, threshold, max_side=max_side)
+    return llm.invoke([keyframes_message(keyframes, question)]).content
+
+
+"""
+Example: a synthetic 5-minute clip with six scenes, decoded lazily at 2 frames per second.
+"""
+if __name__ == "__main__":
+    import time
+
+    width, height, fps, seconds = 1280, 720, 30, 300
+    cuts = [0, 40, 95, 150, 160, 230]
+    colors = np.array([[30, 60, 200], [200, 40, 40], [40, 180, 60], [230, 230, 230], [20, 20, 20], [180, 120, 30]])
+    noise = np.random.default_rng(0).integers(0, 12, (4, height, width, 3), dtype=np.uint8)
+
+    def synthetic_video(sample_fps: float = 2.0):
+        for i in range(int(seconds * sample_fps)):
+            t = i / sample_fps
+            scene = np.searchsorted(cuts, t, side="right") - 1
+            frame = np.empty((height, width, 3), np.uint8)
+            frame[:] = colors[scene]
+            x = int(t * 20) % (width - 200)
+            frame[300:500, x:x + 200] = 255 - colors[scene]
+            frame += noise[i % len(noise)]
+            yield t, frame
+
+    start = time.perf_counter()
+    keyframes = select_keyframes(synthetic_video(), budget=8)
+    print(f"generated and scanned 600 frames in {time.perf_counter() - start:.2f}s: "
+          f"{[(round(k.timestamp, 1), round(k.score, 2)) for k in keyframes]}, scene cuts at {cuts}")
+
+    message = keyframes_message(keyframes, "Describe what happens in this video.")
+    payload = sum(len(part["image_url"]["url"]) for part in message.content if part["type"] == "image_url")
+    all_frames = [encode_jpeg(downsize(frame)) for _, frame in synthetic_video(sample_fps=0.5)]
+    print(f"keyframe message: {payload / 1e3:.0f} kB, ~{85 * len(keyframes)} image tokens at detail=low")
+    print(f"every frame at 0.5 fps: {sum(map(len, all_frames)) / 1e3:.0f} kB, ~{85 * len(all_frames)} image tokens")
+    print(f"raw video at {fps} fps: {width * height * 3 * fps * seconds / 1e9:.0f} GB of pixels")
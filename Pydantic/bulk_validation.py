@@ -0,0 +1,213 @@
+"""Bulk validation of UserInput records
+`validate_user_input` in pydantic_basics.py is fine for one record: it builds
+`UserInput(**input_data)`, pretty-prints it and prints any errors. For a support-ticket
+intake with millions of records per day, that per-record overhead dominates.
+
+Here we stream NDJSON (one JSON object per line) straight through a cached
+`TypeAdapter.validate_json`, so pydantic-core parses and validates each line in one
+step without an intermediate `json.loads`. Valid records and structured error records
+go to two separate NDJSON outputs, and large files can be split across processes.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, ValidationError
+
+
+class UserInput(BaseModel):
+    name: str
+    email: EmailStr
+    query: str
+    order_id: Optional[int] = Field(
+        None,
+        description="5-digit order number (cannot start with 0)",
+        ge=10000,
+        le=99999
+    )
+    purchase_date: Optional[date] = None
+
+
+@lru_cache(maxsize=None)
+def get_adapter(model: type) -> TypeAdapter:
+    # Building a TypeAdapter compiles a validator, so we do it once per model and process.
+    return TypeAdapter(model)
+
+
+def error_record(offset: int, raw: bytes, error: ValidationError) -> dict:
+    return {
+        "offset": offset,
+        "errors": [
+            {"loc": list(e["loc"]), "msg": e["msg"], "type": e["type"]}
+            for e in error.errors(include_url=False, include_input=False)
+        ],
+        "input": raw.decode("utf-8", errors="replace"),
+    }
+
+
+def validate_lines(lines: Iterable[bytes], model: type = UserInput, start_offset: int = 0) -> Iterator[tuple]:
+    """Yield `(True, instance)` or `(False, error_record)` for every non-empty line.
+
+    The offset in error records is the byte offset of the line in the source, which
+    stays meaningful when a file is split across processes.
+    """
+    adapter = get_adapter(model)
+    offset = start_offset
+    for line in lines:
+        line_offset = offset
+        offset += len(line)
+        raw = line.strip()
+        if not raw:
+            continue
+        try:
+            yield True, adapter.validate_json(raw)
+        except ValidationError as e:
+            yield False, error_record(line_offset, raw, e)
+
+
+def _line_start(path: str, offset: int) -> int:
+    # A line belongs to the shard its first byte falls into.
+    if offset == 0:
+        return 0
+    with open(path, "rb") as f:
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+        return f.tell()
+
+
+def _iter_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        position = start
+        f.seek(position)
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line
+            position += len(line)
+
+
+def validate_range(path: str, start: int, end: int, valid_path: str, errors_path: str, model: type = UserInput) -> dict:
+    adapter = get_adapter(model)
+    counts = {"valid": 0, "invalid": 0}
+    with open(valid_path, "wb") as valid_out, open(errors_path, "wb") as errors_out:
+        start = _line_start(path, start)
+        for ok, item in validate_lines(_iter_range(path, start, end), model, start):
+            if ok:
+                valid_out.write(adapter.dump_json(item))
+                valid_out.write(b"\n")
+                counts["valid"] += 1
+            else:
+                errors_out.write(json.dumps(item, ensure_ascii=False).encode("utf-8"))
+                errors_out.write(b"\n")
+                counts["invalid"] += 1
+    return counts
+
+
+def validate_ndjson_file(
+    path: str,
+    valid_path: str,
+    errors_path: str,
+    model: type = UserInput,
+    workers: int = 1,
+    min_shard_bytes: int = 8 * 1024 * 1024,
+) -> dict:
+    """Validate an NDJSON file into `valid_path` and `errors_path`.
+
+    With `workers > 1` the file is cut into byte ranges aligned to line boundaries,
+    each range is validated in its own process into a temporary part file, and the
+    parts are concatenated in order, so the output is the same as a single-process run.
+    Files smaller than `min_shard_bytes` per worker are not worth the process start-up.
+    """
+    size = os.path.getsize(path)
+    workers = max(1, min(workers, size // min_shard_bytes or 1))
+    if workers == 1:
+        return validate_range(path, 0, size, valid_path, errors_path, model)
+
+    bounds = [size * i // workers for i in range(workers + 1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        parts = [
+            (os.path.join(tmp, f"valid.{i}"), os.path.join(tmp, f"errors.{i}"))
+            for i in range(workers)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(validate_range, path, bounds[i], bounds[i + 1], *parts[i], model)
+                for i in range(workers)
+            ]
+            results = [f.result() for f in futures]
+        with open(valid_path, "wb") as valid_out, open(errors_path, "wb") as errors_out:
+            for part_valid, part_errors in parts:
+                with open(part_valid, "rb") as f:
+                    shutil.copyfileobj(f, valid_out)
+                with open(part_errors, "rb") as f:
+                    shutil.copyfileobj(f, errors_out)
+    return {
+        "valid": sum(r["valid"] for r in results),
+        "invalid": sum(r["invalid"] for r in results),
+    }
+
+
+"""
+Let's compare it with the per-record path from pydantic_basics.py
+(`json.loads` + `UserInput(**input_data)`, minus the printing) on a generated file.
+"""
+if __name__ == "__main__":
+    import random
+    import time
+
+    def make_record(i: int) -> dict:
+        record = {
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "query": "I bought a laptop carrying case and it turned out to be the wrong size.",
+            "order_id": 10000 + i % 90000,
+            "purchase_date": "2025-12-31",
+        }
+        if random.random() < 0.05:
+            record["email"] = "not-an-email"
+        if random.random() < 0.02:
+            del record["query"]
+        return record
+
+    n = 50_000
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "tickets.ndjson")
+    with open(source, "w") as f:
+        for i in range(n):
+            f.write(json.dumps(make_record(i)) + "\n")
+
+    start = time.perf_counter()
+    valid = invalid = 0
+    with open(source) as f:
+        for line in f:
+            try:
+                UserInput(**json.loads(line))
+                valid += 1
+            except ValidationError:
+                invalid += 1
+    baseline = time.perf_counter() - start
+    print(f"per-record: {valid} valid, {invalid} invalid in {baseline:.2f}s ({n / baseline:,.0f} rec/s)")
+
+    for workers in (1, os.cpu_count() or 1):
+        start = time.perf_counter()
+        counts = validate_ndjson_file(
+            source,
+            os.path.join(workdir, "valid.ndjson"),
+            os.path.join(workdir, "errors.ndjson"),
+            workers=workers,
+            min_shard_bytes=1024 * 1024,
+        )
+        elapsed = time.perf_counter() - start
+        print(f"bulk, {workers} worker(s): {counts} in {elapsed:.2f}s ({n / elapsed:,.0f} rec/s)")
+
+    with open(os.path.join(workdir, "errors.ndjson")) as f:
+        print("first error record:", f.readline().strip())
+    shutil.rmtree(workdir)
@@ -0,0 +1,178 @@
+"""Map-reduce summarization of long inputs
+`summarization_runnable` in runnable.py sends "Summarize this: {text}" as a single
+prompt. A long document either doesn't fit the context window or becomes one slow
+request that can't use any parallelism.
+
+`MapReduceSummarizer` splits long text into chunks of at most `chunk_tokens` tokens
+with langchain-text-splitters, summarizes the chunks in parallel (at most
+`max_concurrency` requests at a time), then combines the partial summaries in groups
+that fit `reduce_tokens`, round after round, until one group is left. The last reduce
+streams, so `.stream()` yields the final summary as it's written. Short inputs take
+a single request as before.
+
+Tokens are estimated at four characters each by default; pass `count_tokens=llm.get_num_tokens`
+for exact counts with a model that has a tokenizer.
+"""
+
+import logging
+from typing import AsyncIterator, Callable, Iterator
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig, ensure_config
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+map_prompt = PromptTemplate(input_variables=["text"], template="Summarize this: {text}")
+reduce_prompt = PromptTemplate(
+    input_variables=["text"],
+    template="These are summaries of consecutive parts of one document. "
+             "Combine them into a single summary:\n\n{text}")
+
+
+def approximate_tokens(text: str) -> int:
+    # Roughly four characters per token for English.
+    return len(text) // 4 + 1
+
+
+class MapReduceSummarizer(Runnable):
+
+    def __init__(self, llm, chunk_tokens: int = 2000, chunk_overlap: int = 100, reduce_tokens: int = 3000,
+                 max_concurrency: int = 8, count_tokens: Callable[[str], int] = approximate_tokens,
+                 map_prompt: PromptTemplate = map_prompt, reduce_prompt: PromptTemplate = reduce_prompt):
+        self.map_chain = map_prompt | llm | StrOutputParser()
+        self.reduce_chain = reduce_prompt | llm | StrOutputParser()
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.max_concurrency = max_concurrency
+        self.count_tokens = count_tokens
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_tokens, chunk_overlap=chunk_overlap, length_function=count_tokens)
+
+    def _config(self, config: RunnableConfig) -> RunnableConfig:
+        config = ensure_config(config)
+        return {**config, "max_concurrency": config.get("max_concurrency") or self.max_concurrency}
+
+    def _group(self, summaries: list[str]) -> list[str]:
+        """Join consecutive summaries into groups of at most `reduce_tokens` tokens."""
+        groups, current, size = [], [], 0
+        for summary in summaries:
+            tokens = self.count_tokens(summary)
+            if current and size + tokens > self.reduce_tokens:
+                groups.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(summary)
+            size += tokens
+        groups.append("\n\n".join(current))
+        return groups
+
+    def _reduce_rounds(self, summaries: list[str], config: RunnableConfig) -> str:
+        """Reduce until the summaries fit one final reduce; returns its input."""
+        groups = self._group(summaries)
+        while len(groups) > 1:
+            logger.info(f"Reducing {len(summaries)} summaries in {len(groups)} groups")
+            summaries = self.reduce_chain.batch([{"text": g} for g in groups], config)
+            next_groups = self._group(summaries)
+            if len(next_groups) >= len(groups):
+                # Summaries aren't getting shorter; reduce everything in one go.
+                return "\n\n".join(summaries)
+            groups = next_groups
+        return groups[0]
+
+    async def _areduce_rounds(self, summaries: list[str], config: RunnableConfig) -> str:
+        groups = self._group(summaries)
+        while len(groups) > 1:
+            logger.info(f"Reducing {len(summaries)} summaries in {len(groups)} groups")
+            summaries = await self.reduce_chain.abatch([{"text": g} for g in groups], config)
+            next_groups = self._group(summaries)
+            if len(next_groups) >= len(groups):
+                return "\n\n".join(summaries)
+            groups = next_groups
+        return groups[0]
+
+    def _chunks(self, text: str) -> list[str]:
+        if self.count_tokens(text) <= self.chunk_tokens:
+            return [text]
+        return self.splitter.split_text(text)
+
+    def stream(self, input: str, config: RunnableConfig = None, **kwargs) -> Iterator[str]:
+        config = self._config(config)
+        chunks = self._chunks(input)
+        if len(chunks) == 1:
+            yield from self.map_chain.stream({"text": input}, config)
+            return
+        logger.info(f"Summarizing {len(chunks)} chunks")
+        summaries = self.map_chain.batch([{"text": c} for c in chunks], config)
+        yield from self.reduce_chain.stream({"text": self._reduce_rounds(summaries, config)}, config)
+
+    async def astream(self, input: str, config: RunnableConfig = None, **kwargs) -> AsyncIterator[str]:
+        config = self._config(config)
+        chunks = self._chunks(input)
+        if len(chunks) == 1:
+            async for token in self.map_chain.astream({"text": input}, config):
+                yield token
+            return
+        logger.info(f"Summarizing {len(chunks)} chunks")
+        summaries = await self.map_chain.abatch([{"text": c} for c in chunks], config)
+        async for token in self.reduce_chain.astream({"text": await self._areduce_rounds(summaries, config)}, config):
+            yield token
+
+    def invoke(self, input: str, config: RunnableConfig = None, **kwargs) -> str:
+        return "".join(self.stream(input, config))
+
+    async def ainvoke(self, input: str, config: RunnableConfig = None, **kwargs) -> str:
+        return "".join([token async for token in self.astream(input, config)])
+
+
+"""
+Example: a long customer feedback thread
+With a fake model whose latency grows with the prompt length, compare one huge request
+with map-reduce, and stream the final summary.
+"""
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+    from langchain_core.language_models import SimpleChatModel
+    from langchain_core.messages import AIMessageChunk
+    from langchain_core.outputs import ChatGenerationChunk
+
+    class PromptSizedLatencyModel(SimpleChatModel):
+        """Latency grows with the prompt; streams word by word."""
+        answer: str = "Customers like the product quality but complain about delivery and support."
+
+        @property
+        def _llm_type(self) -> str:
+            return "prompt-sized-latency"
+
+        def _call(self, messages, *args, **kwargs):
+            time.sleep(0.05 + approximate_tokens(messages[-1].content) * 0.00002)
+            return self.answer
+
+        def _stream(self, messages, *args, **kwargs):
+            time.sleep(0.05 + approximate_tokens(messages[-1].content) * 0.00002)
+            for word in self.answer.split(" "):
+                time.sleep(0.02)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    llm = PromptSizedLatencyModel()
+    random.seed(0)
+    sentences = ["The product quality is really good.", "Delivery took two weeks.", "Support never answered.",
+                 "The price is fair for what you get.", "Packaging was damaged on arrival."]
+    feedback = "\n\n".join(" ".join(random.choices(sentences, k=8)) for _ in range(3000))
+    print(f"feedback: {approximate_tokens(feedback):,} tokens")
+
+    summarization_runnable = map_prompt | llm
+    start = time.perf_counter()
+    summarization_runnable.invoke({"text": feedback})
+    print(f"one request: {time.perf_counter() - start:.2f}s")
+
+    summarizer = MapReduceSummarizer(llm, chunk_tokens=1000, reduce_tokens=600, max_concurrency=16)
+    start = time.perf_counter()
+    first_token = None
+    for token in summarizer.stream(feedback):
+        first_token = first_token or time.perf_counter() - start
+        sys.stdout.write(token)
+    print(f"\nmap-reduce: {time.perf_counter() - start:.2f}s, first token of final summary at {first_token:.2f}s")